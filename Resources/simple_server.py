@@ -6,6 +6,12 @@ def blender_scene_view():
 		html += [
 			'<li><a href="/bpy/data/objects/%s">%s</a> : %s</li>' % (ob.name, ob.name, ob.type),
 		]
+		if ob.type=='MESH':
+			stats = geometry_stats(ob)
+			size = [hi - lo for lo, hi in zip(*stats['aabb'])]
+			html += [
+				'<li>%s triangles, area %.3f, size %.3f x %.3f x %.3f</li>' % (stats['tris'], stats['area'], *size),
+			]
 		if ob.type=='MESH' and not ob.parent:
 			html += [
 				'<li><img src="/bpy/data/objects/%s.png"/></li>' % ob.name,
@@ -12,6 +12,12 @@ Camera::Camera(int width, int height, glm::vec3 position, float FOVdeg, float ne
 }
 
 void Camera::Matrix(Shader& shader, const char* uniform)
+{
+	// Exports the camera matrix to the Vertex Shader
+	glUniformMatrix4fv(glGetUniformLocation(shader.ID, uniform), 1, GL_FALSE, glm::value_ptr(getMatrix()));
+}
+
+glm::mat4 Camera::getMatrix()
 {
 	if (_stale) {
 		// Initializes matrices since otherwise they will be the null matrix
@@ -26,9 +32,7 @@ void Camera::Matrix(Shader& shader, const char* uniform)
 		camMatrix = projection * view;
 		_stale = false;
 	}
-
-	// Exports the camera matrix to the Vertex Shader
-	glUniformMatrix4fv(glGetUniformLocation(shader.ID, uniform), 1, GL_FALSE, glm::value_ptr(camMatrix));
+	return camMatrix;
 }
 
 void Camera::setDims(int width, int height) {
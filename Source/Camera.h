@@ -21,6 +21,8 @@ public:
 
 	// Updates and exports the camera matrix to the Vertex Shader
 	void Matrix(Shader& shader, const char* uniform);
+	// projection * view, also used to extract the culling frustum
+	glm::mat4 getMatrix();
 
 	void setDims(int width, int height);
 	void setFrustrum(float FOVdeg, float nearPlane, float farPlane);
@@ -39,6 +41,10 @@ public:
 		return Up;
 	};
 
+	float getFOV() {
+		return FOVdeg;
+	};
+
 private:
 	// Stores the main vectors of the camera
 	glm::vec3 Position;
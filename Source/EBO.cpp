@@ -8,6 +8,14 @@ EBO::EBO(std::vector<GLuint>& indices)
 	glBufferData(GL_ELEMENT_ARRAY_BUFFER, indices.size() * sizeof(GLuint), indices.data(), GL_STATIC_DRAW);
 }
 
+// Constructor that uploads packed indices straight from memory (no intermediate copy)
+EBO::EBO(const void* data, GLsizeiptr size)
+{
+	glGenBuffers(1, &ID);
+	glBindBuffer(GL_ELEMENT_ARRAY_BUFFER, ID);
+	glBufferData(GL_ELEMENT_ARRAY_BUFFER, size, data, GL_STATIC_DRAW);
+}
+
 // Binds the EBO
 void EBO::Bind()
 {
@@ -24,6 +24,8 @@ public:
 */
 	// Constructor that generates a Elements Buffer Object and links it to indices
 	EBO(std::vector<GLuint>& indices);
+	// Constructor that uploads packed indices straight from memory (no intermediate copy)
+	EBO(const void* data, GLsizeiptr size);
 
 	// Binds the EBO
 	void Bind();
@@ -1,4 +1,5 @@
 #include "ECS.h"
+#include "Profiler.h"
 
 //#define NO_WIRES
 
@@ -60,6 +61,7 @@ void ECS::addTransform(unsigned int ID, Transform* transf) {
 	entMap[ID] = e;
 }
 void ECS::addModel(unsigned int ID, Model* mdl) {
+	mdl->users++;
 	cset_model.linkEntity(ID, mdl);
 	Entity e = entMap[ID];
 	e.model_flag = 1;
@@ -157,7 +159,7 @@ void ECS::deleteEntity(unsigned int ID) {
 		}
 		if (ret.model_flag) {
             Model* mdlPtr = cset_model.getMem(ID);
-            delete mdlPtr;
+            if (--mdlPtr->users == 0) delete mdlPtr;
             cset_model.unlinkEntity(ID);
 		}
 		if (ret.skmodel_flag) {
@@ -199,6 +201,7 @@ void ECS::deleteEntity(unsigned int ID) {
 }
 
 void ECS::syncPhysics() {
+	NGHOST_PROFILE(PHASE_PHYSICS);
 	for (auto it = cset_body.entVec.begin(); it != cset_body.entVec.end(); it++)
 	{
         unsigned int ID = *it;
@@ -229,7 +232,7 @@ void ECS::DrawScreenEntity(unsigned int ID) {
 	linkCameraUniforms(globals.animProgram, *globals.handCam);
 	linkCameraUniforms(globals.noTexAnimProgram, *globals.handCam);
     Entity e = getEntity(ID);
-    if (!e.visible_flag) {
+    if (!e.visible_flag || e.culled_flag) {
        return;
     }
     if (e.stencil_flag) {
@@ -285,8 +288,25 @@ void ECS::DrawEntity(unsigned int ID) {
 	linkCameraUniforms(globals.lightProgram, *globals.camera);
 	linkCameraUniforms(globals.animProgram, *globals.camera);
 	linkCameraUniforms(globals.noTexAnimProgram, *globals.camera);
+    drawEntity(ID);
+}
+
+// draws entities in the given order (generated code sorts them by shader, mesh and material),
+// the camera uniforms only have to be linked once for the whole queue
+void ECS::DrawEntityQueue(const unsigned short* IDs, unsigned int count) {
+	NGHOST_PROFILE(PHASE_ENTITY);
+	linkCameraUniforms(globals.rigProgram, *globals.camera);
+	linkCameraUniforms(globals.lightProgram, *globals.camera);
+	linkCameraUniforms(globals.animProgram, *globals.camera);
+	linkCameraUniforms(globals.noTexAnimProgram, *globals.camera);
+    for (unsigned int i = 0; i < count; i++) {
+        drawEntity(IDs[i]);
+    }
+}
+
+void ECS::drawEntity(unsigned int ID) {
     Entity e = getEntity(ID);
-    if (!e.visible_flag) {
+    if (!e.visible_flag || e.culled_flag) {
         return;
     }
     if (e.stencil_flag) {
@@ -317,7 +337,8 @@ void ECS::DrawEntity(unsigned int ID) {
             glUniformMatrix4fv(glGetUniformLocation(sh.ID, ("finalBonesMatrices[" + std::to_string(i) + "]").c_str()), 1, GL_FALSE, &transforms[i][0][0]);
         }
         skmdl->Draw(sh, *globals.camera, finaltransform, finalntransform);
-    } else if (e.model_flag) {
+    } else if (e.model_flag && (!e.instanced_flag || e.stencil_flag)) {
+        // a highlighted copy is drawn on its own so it writes the stencil
         Model* mdl = cset_model.getMem(ID);
         if (e.surface_flag) {
             //glStencilFunc(GL_ALWAYS, 0, 0xFF);
@@ -352,6 +373,7 @@ void ECS::DrawEntity(unsigned int ID) {
 
 // TODO: this function needs to be updated to support multiple cameras!
 void ECS::DrawEntities() {
+	NGHOST_PROFILE(PHASE_ENTITY);
 	linkCameraUniforms(globals.rigProgram, *globals.camera);
 	linkCameraUniforms(globals.lightProgram, *globals.camera);
 	linkCameraUniforms(globals.animProgram, *globals.camera);
@@ -361,7 +383,7 @@ void ECS::DrawEntities() {
         unsigned int ID = *it;
         Entity e = entMap[ID];
 
-        if (!e.visible_flag) continue;
+        if (!e.visible_flag || e.culled_flag) continue;
 
         if (e.stencil_flag) {
             glStencilFunc(GL_ALWAYS, 1, 0xFF);
@@ -393,7 +415,7 @@ void ECS::DrawEntities() {
             skmdl->Draw(sh, *globals.camera, finaltransform, finalntransform);
         } else
 
-        if (e.model_flag) {
+        if (e.model_flag && (!e.instanced_flag || e.stencil_flag)) {
             Model* mdl = cset_model.getMem(ID);
             if (!e.shader_flag) std::cerr << "no shader?" << std::endl;
             if (e.surface_flag) {
@@ -447,7 +469,7 @@ void ECS::DrawEntities() {
 	{
         unsigned int ID = *it;
         Entity e = getEntity(ID);
-        if (!e.visible_flag) continue;
+        if (!e.visible_flag || e.culled_flag) continue;
         glm::mat4 finaltransform;
         glm::mat4 finalntransform;
         if (e.phystransform_flag) {
@@ -494,7 +516,7 @@ void ECS::DrawEntities() {
 	{
 		unsigned int ID = *it;
 		Entity e = getEntity(ID);
-        if (!e.visible_flag) continue;
+        if (!e.visible_flag || e.culled_flag) continue;
         glm::mat4 finaltransform;
         glm::mat4 finalntransform;
         if (e.phystransform_flag) {
@@ -534,6 +556,7 @@ void ECS::DrawEntities() {
 */
 
 void ECS::advanceEntityAnimations(float delta) {
+	NGHOST_PROFILE(PHASE_ANIMATION);
 	for (auto it = cset_animator.entVec.begin(); it != cset_animator.entVec.end(); it++)
 	{
         unsigned int ID = *it;
@@ -543,11 +566,12 @@ void ECS::advanceEntityAnimations(float delta) {
 }
 
 void ECS::DrawEntityShadows() {
+	NGHOST_PROFILE(PHASE_SHADOW);
 	for (auto it = cset_skmodel.entVec.begin(); it != cset_skmodel.entVec.end(); it++)
 	{
         unsigned int ID = *it;
         Entity e = getEntity(ID);
-        if (!e.visible_flag) continue;
+        if (!e.visible_flag || e.culled_flag) continue;
         glm::mat4 finaltransform;
         if (e.phystransform_flag) {
             finaltransform = cset_phystransform.getMem(ID)->getMatrix() * cset_transform.getMem(ID)->getMatrix();
@@ -568,7 +592,7 @@ void ECS::DrawEntityShadows() {
 	{
         unsigned int ID = *it;
         Entity e = getEntity(ID);
-        if (!e.visible_flag) continue;
+        if (!e.visible_flag || e.culled_flag) continue;
         glm::mat4 finaltransform;
         if (e.phystransform_flag) {
             finaltransform = cset_phystransform.getMem(ID)->getMatrix() * cset_transform.getMem(ID)->getMatrix();
@@ -583,11 +607,12 @@ void ECS::DrawEntityShadows() {
 }
 
 void ECS::DrawEntityPointShadows() {
+	NGHOST_PROFILE(PHASE_POINT_SHADOW);
     for (auto it = cset_skmodel.entVec.begin(); it != cset_skmodel.entVec.end(); it++)
 	{
         unsigned int ID = *it;
         Entity e = getEntity(ID);
-        if (!e.visible_flag) continue;
+        if (!e.visible_flag || e.culled_flag) continue;
         if (e.light_flag) continue;
         glm::mat4 finaltransform;
         if (e.phystransform_flag) {
@@ -609,7 +634,7 @@ void ECS::DrawEntityPointShadows() {
 	{
         unsigned int ID = *it;
         Entity e = getEntity(ID);
-        if (!e.visible_flag) continue;
+        if (!e.visible_flag || e.culled_flag) continue;
         if (e.light_flag) continue;
         glm::mat4 finaltransform;
         if (e.phystransform_flag) {
@@ -625,6 +650,7 @@ void ECS::DrawEntityPointShadows() {
 }
 
 void ECS::DrawEntityStencils() {
+	NGHOST_PROFILE(PHASE_STENCIL);
 	glStencilFunc(GL_NOTEQUAL, 1, 0xFF);
 	glStencilMask(0x00);
 	glDisable(GL_DEPTH_TEST);
@@ -635,7 +661,7 @@ void ECS::DrawEntityStencils() {
 	{
         unsigned int ID = *it;
         Entity e = getEntity(ID);
-        if (!e.visible_flag) continue;
+        if (!e.visible_flag || e.culled_flag) continue;
         if (!e.model_flag) continue;
 
         Model* mdl = cset_model.getMem(ID);
@@ -129,6 +129,7 @@ public:
     void DrawEntities();
     void DrawScreenEntity(unsigned int ID);
     void DrawEntity(unsigned int ID);
+    void DrawEntityQueue(const unsigned short* IDs, unsigned int count);
 
     void deleteEntity(unsigned int ID);
     Entity getEntity(unsigned int ID);
@@ -151,6 +152,7 @@ public:
 private:
     ECS(); // no public constructor
     ~ECS(); // no public destructor
+    void drawEntity(unsigned int ID); // DrawEntity without linking the camera uniforms
     static ECS* instance; // declaration class variable
 
 
@@ -11,6 +11,7 @@ class Entity {
 		/// <summary>
 		///  these are the 32 bits we will limit ourselves to. some combo of C style bitfield and enums...
 		///	 we need the entity class to atleast be smaller than a ptr, (64 bits)
+		///  (the flags after m_camera spill into a second word, still within 64 bits)
 		/// </summary>
 		unsigned int m_id : 16; // steal 16 bits from 32 bit int instead of changing to short...
 		unsigned int transform_flag : 1 = 0;
@@ -28,6 +29,8 @@ class Entity {
 		unsigned int surface_flag : 1 = 0; // to be removed?
 		unsigned int light_flag : 1 = 0;
 		unsigned int m_camera : 2 = 0; // 0 = camx, 1 = cam1, 2 = cam2, 3 = cam3 // to be removed?
+		unsigned int instanced_flag : 1 = 0; // color pass drawn by a MeshInstances batch, unless stenciled
+		unsigned int culled_flag : 1 = 0; // outside the camera frustum, set by the scene cull and kept apart from visible_flag
 
 	private:
 };
@@ -0,0 +1,60 @@
+#include "Frustum.h"
+
+Frustum::Frustum(const glm::mat4& m)
+{
+	// glm is column major, m[c][r]
+	glm::vec4 row0(m[0][0], m[1][0], m[2][0], m[3][0]);
+	glm::vec4 row1(m[0][1], m[1][1], m[2][1], m[3][1]);
+	glm::vec4 row2(m[0][2], m[1][2], m[2][2], m[3][2]);
+	glm::vec4 row3(m[0][3], m[1][3], m[2][3], m[3][3]);
+
+	planes[0] = row3 + row0; // left
+	planes[1] = row3 - row0; // right
+	planes[2] = row3 + row1; // bottom
+	planes[3] = row3 - row1; // top
+	planes[4] = row3 + row2; // near
+	planes[5] = row3 - row2; // far
+}
+
+int Frustum::testAABB(const float* min, const float* max) const
+{
+	int result = 1;
+	for (int i = 0; i < 6; i++)
+	{
+		const glm::vec4& p = planes[i];
+		// corner furthest along the plane normal, then the nearest one
+		float outer = p.x * (p.x > 0 ? max[0] : min[0]) + p.y * (p.y > 0 ? max[1] : min[1]) + p.z * (p.z > 0 ? max[2] : min[2]) + p.w;
+		if (outer < 0)
+			return -1;
+		float inner = p.x * (p.x > 0 ? min[0] : max[0]) + p.y * (p.y > 0 ? min[1] : max[1]) + p.z * (p.z > 0 ? min[2] : max[2]) + p.w;
+		if (inner < 0)
+			result = 0;
+	}
+	return result;
+}
+
+unsigned int Frustum::cull(const BVHNode* nodes, unsigned int nodeCount, const unsigned short* items, unsigned char* visible) const
+{
+	unsigned int n = 0;
+	unsigned int i = 0;
+	while (i < nodeCount)
+	{
+		const BVHNode& node = nodes[i];
+		int r = testAABB(node.min, node.max);
+		if (r == 0 && node.skip != i + 1)
+		{
+			// partially visible, descend
+			i++;
+			continue;
+		}
+		unsigned char v = r >= 0;
+		for (unsigned int k = node.first; k < (unsigned int)node.first + node.count; k++)
+		{
+			visible[items[k]] = v;
+		}
+		if (v)
+			n += node.count;
+		i = node.skip;
+	}
+	return n;
+}
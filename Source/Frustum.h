@@ -0,0 +1,34 @@
+#ifndef FRUSTUM_H
+#define FRUSTUM_H
+
+#include "glm/glm.hpp"
+
+// node of a bounding volume hierarchy generated at build time, nodes are stored depth first
+// so the items of a subtree are the range [first, first + count) of the item array and skip
+// is the index of the next node outside the subtree (skip == index + 1 for a leaf)
+struct BVHNode {
+	float min[3];
+	float max[3];
+	unsigned short first;
+	unsigned short count;
+	unsigned short skip;
+};
+
+class Frustum
+{
+public:
+	// extracts the six clip planes from a projection * view matrix
+	Frustum(const glm::mat4& camMatrix);
+
+	// -1 outside, 0 intersecting, 1 fully inside
+	int testAABB(const float* min, const float* max) const;
+
+	// writes visible[item] for every item of the hierarchy, whole subtrees are accepted or
+	// rejected with one test, returns the number of visible items
+	unsigned int cull(const BVHNode* nodes, unsigned int nodeCount, const unsigned short* items, unsigned char* visible) const;
+
+private:
+	glm::vec4 planes[6];
+};
+
+#endif
@@ -1,4 +1,5 @@
 #include "GUI.h"
+#include "Profiler.h"
 
 GUI* GUI::instance = nullptr; // definition class variable
 
@@ -97,6 +98,7 @@ GUI::~GUI() {
 }
 
 void GUI::RenderText(Shader& s, std::string text, float x, float y, float scale, glm::vec3 color) {
+	NGHOST_PROFILE(PHASE_GUI);
 	// activate corresponding render state	
 	s.Activate();
 	glUniform3f(glGetUniformLocation(s.ID, "textColor"), color.x, color.y, color.z);
@@ -44,6 +44,12 @@ public:
     Camera * handCam;
     double rotX;
     double rotY;
+    // render counters, reset by the generated netghost_redraw each frame
+    unsigned int drawCalls = 0;
+    unsigned int stateChanges = 0; // program and VAO switches
+    // frustum culling result of the generated scene, updated by netghost_cull
+    unsigned int objectsDrawn = 0;
+    unsigned int objectsCulled = 0;
 
 private:
     Globals()
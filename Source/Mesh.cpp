@@ -7,6 +7,7 @@ Mesh::Mesh(std::vector<Vertex> verts, std::vector<GLuint> indices){
 	m_VAO.Bind();
 	m_VBO = VBO(this->vertices);
 	m_EBO = EBO(this->indices);
+	numIndices = this->indices.size();
 	m_VAO.LinkAttrib(m_VBO, 0, 3, GL_FLOAT, sizeof(Vertex), (void*)0); // pos
 	m_VAO.LinkAttrib(m_VBO, 1, 3, GL_FLOAT, sizeof(Vertex), (void*)(3 * sizeof(float))); // normal
 	m_VAO.LinkAttrib(m_VBO, 2, 2, GL_FLOAT, sizeof(Vertex), (void*)(6 * sizeof(float))); // texUV
@@ -15,6 +16,21 @@ Mesh::Mesh(std::vector<Vertex> verts, std::vector<GLuint> indices){
 	m_EBO.Unbind();
 }
 
+Mesh::Mesh(const void* verts, GLsizei numVerts, const void* indices, GLsizei numIndices, GLenum indexType){
+	this->numIndices = numIndices;
+	this->indexType = indexType;
+	model = glm::mat4(1.0f);
+	m_VAO.Bind();
+	m_VBO = VBO(verts, numVerts * sizeof(Vertex));
+	m_EBO = EBO(indices, numIndices * (indexType == GL_UNSIGNED_SHORT ? sizeof(GLushort) : sizeof(GLuint)));
+	m_VAO.LinkAttrib(m_VBO, 0, 3, GL_FLOAT, sizeof(Vertex), (void*)0); // pos
+	m_VAO.LinkAttrib(m_VBO, 1, 3, GL_FLOAT, sizeof(Vertex), (void*)(3 * sizeof(float))); // normal
+	m_VAO.LinkAttrib(m_VBO, 2, 2, GL_FLOAT, sizeof(Vertex), (void*)(6 * sizeof(float))); // texUV
+	m_VAO.Unbind();
+	m_VBO.Unbind();
+	m_EBO.Unbind();
+}
+
 Mesh::Mesh(std::vector <Vertex>& vertices, std::vector <GLuint>& indices, std::vector <Texture>& textures, glm::mat4& model) {
 
 	Mesh::vertices = vertices;
@@ -26,6 +42,7 @@ Mesh::Mesh(std::vector <Vertex>& vertices, std::vector <GLuint>& indices, std::v
 
 	m_VBO = VBO(vertices);
 	m_EBO = EBO(indices);
+	numIndices = indices.size();
 
 	m_VAO.LinkAttrib(m_VBO, 0, 3, GL_FLOAT, sizeof(Vertex), (void*)0); // pos
 	m_VAO.LinkAttrib(m_VBO, 1, 3, GL_FLOAT, sizeof(Vertex), (void*)(3 * sizeof(float))); // normal
@@ -81,14 +98,17 @@ void Mesh::Draw(
 	glUniformMatrix4fv(glGetUniformLocation(shader.ID, "model"), 1, GL_FALSE, glm::value_ptr(model));
 
 	// Draw the actual mesh
-	glDrawElements(GL_TRIANGLES, indices.size(), GL_UNSIGNED_INT, 0);
+	glDrawElements(GL_TRIANGLES, numIndices, indexType, 0);
+	Globals::get().drawCalls++;
 }
 
 void Mesh::DrawShadow(
 	Shader& shader,
 	glm::mat4 transform
 ) {
+#ifdef NETGHOST_DEBUG
 	std::cout << shader.ID << std::endl;
+#endif
 	shader.Activate();
 	m_VAO.Bind();
 
@@ -99,5 +119,6 @@ void Mesh::DrawShadow(
 	glUniformMatrix4fv(glGetUniformLocation(shader.ID, "model"), 1, GL_FALSE, glm::value_ptr(model));
 
 	// Draw the actual mesh
-	glDrawElements(GL_TRIANGLES, indices.size(), GL_UNSIGNED_INT, 0);
+	glDrawElements(GL_TRIANGLES, numIndices, indexType, 0);
+	Globals::get().drawCalls++;
 }
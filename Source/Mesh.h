@@ -17,12 +17,16 @@ public:
 	std::vector <GLuint> indices;
 	std::vector <Texture> textures; // texture class is already sudo-pointer
 	glm::mat4 model; // sends mesh to default model position (same as in blender) AKA model matrix
+	GLsizei numIndices = 0; // packed meshes keep no CPU copy of their indices
+	GLenum indexType = GL_UNSIGNED_INT; // GL_UNSIGNED_SHORT for packed meshes under 65536 vertices
 
 	VAO m_VAO;
 	VBO m_VBO;
 	EBO m_EBO;
 
 	Mesh(std::vector<Vertex> verts, std::vector<GLuint> indices);
+	// packed interleaved Vertex data and GLuint/GLushort indices, uploaded in place (see build.py genmain)
+	Mesh(const void* verts, GLsizei numVerts, const void* indices, GLsizei numIndices, GLenum indexType = GL_UNSIGNED_INT);
 	Mesh(std::vector <Vertex>& vertices, std::vector <GLuint>& indices, std::vector <Texture>& textures, glm::mat4& model);
 /*
 	Mesh(Mesh&& other) {
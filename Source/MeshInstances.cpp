@@ -0,0 +1,66 @@
+#include "MeshInstances.h"
+#include "Profiler.h"
+
+MeshInstances::MeshInstances(Mesh* mesh)
+{
+	this->mesh = mesh;
+	m_VBO = VBO(nullptr, 0);
+	mesh->m_VAO.Bind();
+	m_VBO.Bind();
+	for (GLuint i = 0; i < 8; i++)
+	{
+		glVertexAttribPointer(4 + i, 4, GL_FLOAT, GL_FALSE, 2 * sizeof(glm::mat4), (void*)(i * sizeof(glm::vec4)));
+		glEnableVertexAttribArray(4 + i);
+		glVertexAttribDivisor(4 + i, 1);
+	}
+	mesh->m_VAO.Unbind();
+	m_VBO.Unbind();
+}
+
+MeshInstances::~MeshInstances()
+{
+	m_VBO.Delete();
+}
+
+void MeshInstances::add(Transform* trf)
+{
+	transforms.push_back(trf);
+	dirty = true;
+}
+
+void MeshInstances::Draw(Shader& shader, Camera& camera)
+{
+	if (!visible)
+		return;
+	NGHOST_PROFILE(PHASE_ENTITY);
+	// only re-upload when an instance moved since the last frame
+	for (unsigned int i = 0; i < versions.size() && !dirty; i++)
+	{
+		if (transforms[i]->version != versions[i])
+			dirty = true;
+	}
+	if (dirty)
+	{
+		matrices.resize(transforms.size() * 2);
+		versions.resize(transforms.size());
+		for (unsigned int i = 0; i < transforms.size(); i++)
+		{
+			matrices[2 * i] = transforms[i]->getMatrix();
+			matrices[2 * i + 1] = transforms[i]->getNormalMatrix();
+			versions[i] = transforms[i]->version;
+		}
+		m_VBO.Bind();
+		glBufferData(GL_ARRAY_BUFFER, matrices.size() * sizeof(glm::mat4), matrices.data(), GL_DYNAMIC_DRAW);
+		m_VBO.Unbind();
+		dirty = false;
+	}
+
+	shader.Activate();
+	camera.Matrix(shader, "camMatrix");
+	glUniformMatrix4fv(glGetUniformLocation(shader.ID, "model"), 1, GL_FALSE, glm::value_ptr(mesh->model));
+
+	mesh->m_VAO.Bind();
+	glDrawElementsInstanced(GL_TRIANGLES, mesh->numIndices, mesh->indexType, 0, transforms.size());
+	Globals::get().drawCalls++;
+	mesh->m_VAO.Unbind();
+}
@@ -0,0 +1,33 @@
+#ifndef MESH_INSTANCES_H
+#define MESH_INSTANCES_H
+
+#include "Mesh.h"
+#include <glm/gtc/quaternion.hpp>
+#include "Transform.h"
+#include <vector>
+
+// draws every copy of one Mesh with a single instanced draw call,
+// per-instance transform and ntransform are vertex attributes 4-7 and 8-11.
+// the transforms belong to the entities of the copies (flagged instanced_flag),
+// which still take part in the shadow, stencil and wireframe passes
+class MeshInstances
+{
+public:
+	MeshInstances(Mesh* mesh);
+	~MeshInstances();
+
+	void add(Transform* trf);
+	void Draw(Shader& shader, Camera& camera);
+
+	Mesh* mesh;
+	std::vector<Transform*> transforms;
+	bool visible = true; // cleared when the whole group is frustum culled
+
+private:
+	VBO m_VBO;
+	std::vector<glm::mat4> matrices; // transform, ntransform per instance
+	std::vector<unsigned int> versions; // Transform::version at the last upload
+	bool dirty = true;
+};
+
+#endif
@@ -152,7 +152,9 @@ void Model::Draw(Shader& shader, Camera& camera,
 }
 
 void Model::DrawShadow(Shader& shader, glm::mat4& transform){
+#ifdef NETGHOST_DEBUG
 	std::cout << m_name << std::endl;
+#endif
 	for (unsigned int i = 0; i < meshes.size(); i++) {
 		meshes[i].DrawShadow(shader, transform);
 	}
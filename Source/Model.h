@@ -30,6 +30,7 @@ public:
 	std::string m_name = " ";
 
 	Material mat; // this mat here may have to stay
+	unsigned int users = 0; // entities sharing this model, see ECS::addModel
 	// model data
 	std::vector<Mesh> meshes;
 
@@ -1,4 +1,5 @@
 #include "ParticleRenderer.h"
+#include "Profiler.h"
 
 const double PI = 3.1415926535897932384626433832795028841971693993751058209;
 
@@ -94,6 +95,7 @@ ParticleRenderer::~ParticleRenderer() {
 }
 
 void ParticleRenderer::DrawParticles(Shader& shader, Camera& camera){
+    NGHOST_PROFILE(PHASE_PARTICLE);
     std::vector <glm::mat4> transforms;
     std::vector <float> lifeVec;
 
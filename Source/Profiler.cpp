@@ -0,0 +1,98 @@
+#include "Profiler.h"
+
+Profiler* Profiler::instance = nullptr; // definition class variable
+
+static const char* phaseNames[PHASE_COUNT] = {
+	"tick", "physics", "animation", "shadow", "point_shadow", "stencil", "entity", "particle", "gui", "frame"
+};
+
+const char* Profiler::phaseName(unsigned int phase) {
+	return phase < PHASE_COUNT ? phaseNames[phase] : nullptr;
+}
+
+void Profiler::beginFrame() {
+	if (!checked) {
+		// needs the GL context, so it is checked on the first frame
+#ifndef EMSCRIPTEN
+		gpuTimers = GLEW_VERSION_3_3 || GLEW_ARB_timer_query;
+#endif
+		checked = true;
+	}
+	Sample& s = samples[frame % PROFILER_HISTORY];
+	for (unsigned int i = 0; i < PHASE_COUNT; i++) {
+		s.cpu[i] = 0.0f;
+		s.gpu[i] = 0.0f;
+	}
+	unsigned int set = frame % PROFILER_LATENCY;
+	if (gpuTimers && querySets[set].used)
+		collect(set);
+	querySets[set].used = 0;
+	querySets[set].frame = frame;
+	started[PHASE_FRAME] = std::chrono::steady_clock::now();
+}
+
+void Profiler::endFrame() {
+	end(PHASE_FRAME);
+	frame++;
+}
+
+void Profiler::begin(ProfilePhase phase) {
+	started[phase] = std::chrono::steady_clock::now();
+#ifndef EMSCRIPTEN
+	// only the draw phases are timed on the GPU
+	if (gpuTimers && activeQuery < 0 && phase >= PHASE_SHADOW && phase <= PHASE_GUI) {
+		QuerySet& qs = querySets[frame % PROFILER_LATENCY];
+		if (qs.used == qs.ids.size()) {
+			GLuint id;
+			glGenQueries(1, &id);
+			qs.ids.push_back(id);
+			qs.phases.push_back(0);
+		}
+		qs.phases[qs.used] = phase;
+		glBeginQuery(GL_TIME_ELAPSED, qs.ids[qs.used++]);
+		activeQuery = phase;
+	}
+#endif
+}
+
+void Profiler::end(ProfilePhase phase) {
+	std::chrono::duration<float, std::milli> ms = std::chrono::steady_clock::now() - started[phase];
+	samples[frame % PROFILER_HISTORY].cpu[phase] += ms.count();
+#ifndef EMSCRIPTEN
+	if (activeQuery == phase) {
+		glEndQuery(GL_TIME_ELAPSED);
+		activeQuery = -1;
+	}
+#endif
+}
+
+void Profiler::collect(unsigned int set) {
+#ifndef EMSCRIPTEN
+	QuerySet& qs = querySets[set];
+	// the frame may already have left the ring buffer
+	if (frame - qs.frame >= PROFILER_HISTORY)
+		return;
+	Sample& s = samples[qs.frame % PROFILER_HISTORY];
+	for (unsigned int i = 0; i < qs.used; i++) {
+		GLint available = 0;
+		glGetQueryObjectiv(qs.ids[i], GL_QUERY_RESULT_AVAILABLE, &available);
+		if (!available)
+			continue; // never wait on the GPU, the sample stays short
+		GLuint64 ns = 0;
+		glGetQueryObjectui64v(qs.ids[i], GL_QUERY_RESULT, &ns);
+		s.gpu[qs.phases[i]] += ns / 1000000.0f;
+	}
+#endif
+}
+
+const float* Profiler::getStats(unsigned int& frames) {
+	frames = frame < PROFILER_HISTORY ? frame : PROFILER_HISTORY;
+	for (unsigned int f = 0; f < frames; f++) {
+		const Sample& s = samples[(frame - frames + f) % PROFILER_HISTORY];
+		for (unsigned int i = 0; i < PHASE_COUNT; i++) {
+			linear[(f * 2) * PHASE_COUNT + i] = s.cpu[i];
+			linear[(f * 2 + 1) * PHASE_COUNT + i] = s.gpu[i];
+		}
+	}
+	return linear;
+}
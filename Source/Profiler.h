@@ -0,0 +1,93 @@
+#ifndef PROFILER_H
+#define PROFILER_H
+
+#define GLEW_STATIC
+#include <GL/glew.h>
+#include <GLFW/glfw3.h>
+
+#include <chrono>
+#include <vector>
+
+#define PROFILER_HISTORY 256 // frames kept in the ring buffer
+#define PROFILER_LATENCY 3 // GPU timer queries are read back this many frames later
+
+enum ProfilePhase {
+	PHASE_TICK,
+	PHASE_PHYSICS,
+	PHASE_ANIMATION,
+	PHASE_SHADOW,
+	PHASE_POINT_SHADOW,
+	PHASE_STENCIL,
+	PHASE_ENTITY,
+	PHASE_PARTICLE,
+	PHASE_GUI,
+	PHASE_FRAME,
+	PHASE_COUNT
+};
+
+// per-phase CPU times and GL timer query GPU times of the last PROFILER_HISTORY frames, in ms
+class Profiler {
+public:
+	// defines an class operation that lets clients access its unique instance.
+	static Profiler& get() {
+		// may be responsible for creating its own unique instance.
+		if (nullptr == instance) instance = new Profiler;
+		return *instance;
+	}
+	Profiler(const Profiler&) = delete; // rule of three
+	Profiler& operator=(const Profiler&) = delete;
+	static void destruct() {
+		delete instance;
+		instance = nullptr;
+	}
+
+	void beginFrame();
+	void endFrame();
+	void begin(ProfilePhase phase);
+	void end(ProfilePhase phase);
+
+	// oldest frame first, PHASE_COUNT cpu times then PHASE_COUNT gpu times per frame
+	const float* getStats(unsigned int& frames);
+	static const char* phaseName(unsigned int phase);
+
+	bool gpuTimers = false; // false on emscripten and drivers without GL_ARB_timer_query
+
+private:
+	Profiler() = default; // no public constructor
+	~Profiler() = default; // no public destructor
+	static Profiler* instance; // declaration class variable
+
+	void collect(unsigned int set);
+
+	struct Sample {
+		float cpu[PHASE_COUNT];
+		float gpu[PHASE_COUNT];
+	};
+	struct QuerySet {
+		std::vector<GLuint> ids;
+		std::vector<unsigned char> phases;
+		unsigned int used = 0;
+		unsigned long frame = 0;
+	};
+
+	Sample samples[PROFILER_HISTORY] = {};
+	float linear[PROFILER_HISTORY * PHASE_COUNT * 2];
+	unsigned long frame = 0;
+	bool checked = false;
+	std::chrono::steady_clock::time_point started[PHASE_COUNT];
+	QuerySet querySets[PROFILER_LATENCY];
+	int activeQuery = -1; // GL_TIME_ELAPSED queries do not nest, phase of the running one
+};
+
+// times the enclosing scope
+class ProfileScope {
+public:
+	ProfileScope(ProfilePhase phase) : phase(phase) { Profiler::get().begin(phase); }
+	~ProfileScope() { Profiler::get().end(phase); }
+private:
+	ProfilePhase phase;
+};
+
+#define NGHOST_PROFILE(phase) ProfileScope __profile_scope__(phase)
+
+#endif
@@ -1,4 +1,12 @@
 #include "Shader.h"
+#include "Globals.h"
+#include <cstdio>
+#include <cstdlib>
+#include <filesystem>
+#include <vector>
+
+// program currently in use, glUseProgram is only called through Activate
+static GLuint activeProgram = 0;
 
 std::string get_file_contents(const char* filename) {
 	std::ifstream in(filename, std::ios::binary);
@@ -43,10 +51,93 @@ void Shader::compile(){
 	ID = glCreateProgram();
 	glAttachShader(ID, this->vid);
 	glAttachShader(ID, this->fid);
+#ifndef __EMSCRIPTEN__
+	if (GLEW_ARB_get_program_binary)
+		glProgramParameteri(ID, GL_PROGRAM_BINARY_RETRIEVABLE_HINT, GL_TRUE);
+#endif
 	glLinkProgram(ID);
 	checkCompileErrors(ID, "PROGRAM");
 }
 
+#ifndef __EMSCRIPTEN__
+// FNV-1a, stable across runs and standard libraries (unlike std::hash)
+static unsigned long long fnv1a(const std::string& s, unsigned long long h = 14695981039346656037ULL) {
+	for (unsigned char c : s) {
+		h ^= c;
+		h *= 1099511628211ULL;
+	}
+	return h;
+}
+
+// program binaries are only valid for the driver that produced them, so the driver
+// strings are part of the key and a driver update simply misses the cache
+static std::string programCachePath(const std::string& vertexCode, const std::string& fragmentCode) {
+	std::string dir;
+	if (const char* env = std::getenv("NETGHOST_CACHE")) dir = env;
+	else if (const char* home = std::getenv("HOME")) dir = std::string(home) + "/.cache/netghost";
+	else return "";
+	dir += "/programs";
+	std::error_code err;
+	std::filesystem::create_directories(dir, err);
+	if (err) return "";
+
+	std::string driver;
+	for (GLenum name : {GL_VENDOR, GL_RENDERER, GL_VERSION}) {
+		const GLubyte* str = glGetString(name);
+		if (str) driver += (const char*)str;
+		driver += '\n';
+	}
+	unsigned long long h = fnv1a(fragmentCode, fnv1a(vertexCode + '\0', fnv1a(driver + '\0')));
+	char key[17];
+	snprintf(key, sizeof(key), "%016llx", h);
+	return dir + "/" + key + ".bin";
+}
+#endif
+
+void Shader::load(std::string vertexCode, std::string fragmentCode) {
+#ifndef __EMSCRIPTEN__
+	std::string path;
+	if (GLEW_ARB_get_program_binary) path = programCachePath(vertexCode, fragmentCode);
+	if (!path.empty()) {
+		std::ifstream in(path, std::ios::binary);
+		GLenum format;
+		if (in && in.read((char*)&format, sizeof(format))) {
+			std::vector<char> binary((std::istreambuf_iterator<char>(in)), std::istreambuf_iterator<char>());
+			ID = glCreateProgram();
+			glProgramBinary(ID, format, binary.data(), binary.size());
+			GLint success;
+			glGetProgramiv(ID, GL_LINK_STATUS, &success);
+			if (success) return;
+			// rejected by the driver, compile from source and replace the entry
+			glDeleteProgram(ID);
+		}
+	}
+#endif
+	set_vshader(vertexCode);
+	set_fshader(fragmentCode);
+	compile();
+	glDeleteShader(vid);
+	glDeleteShader(fid);
+#ifndef __EMSCRIPTEN__
+	GLint success, length = 0;
+	glGetProgramiv(ID, GL_LINK_STATUS, &success);
+	if (path.empty() || !success) return;
+	glGetProgramiv(ID, GL_PROGRAM_BINARY_LENGTH, &length);
+	if (length <= 0) return;
+	std::vector<char> binary(length);
+	GLenum format;
+	glGetProgramBinary(ID, length, NULL, &format, binary.data());
+	// write then rename so a crashed run never leaves a truncated entry behind
+	std::string tmp = path + ".tmp";
+	std::ofstream out(tmp, std::ios::binary);
+	out.write((const char*)&format, sizeof(format));
+	out.write(binary.data(), binary.size());
+	out.close();
+	std::error_code err;
+	std::filesystem::rename(tmp, path, err);
+#endif
+}
+
 Shader::Shader(std::string vertexFile, std::string fragmentFile) {
 
 	std::string vertPath = ("shaders/" + vertexFile);
@@ -133,9 +224,13 @@ Shader::Shader(std::string vertexFile, std::string fragmentFile, std::string geo
 }
 
 void Shader::Activate() {
+	if (ID == activeProgram) return;
+	activeProgram = ID;
+	Globals::get().stateChanges++;
 	glUseProgram(ID);
 }
 
 void Shader::Delete() {
+	if (ID == activeProgram) activeProgram = 0;
 	glDeleteProgram(ID);
 }
@@ -24,6 +24,8 @@ class Shader
 		void set_vshader(std::string);
 		void set_fshader(std::string);
 		void compile();
+		// compile and link from source, native builds reuse a cached program binary
+		void load(std::string vertexCode, std::string fragmentCode);
 
 		void Activate();
 		void Delete();
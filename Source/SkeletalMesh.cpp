@@ -75,6 +75,7 @@ void SkeletalMesh::Draw(
 
 	// Draw the actual mesh
 	glDrawElements(GL_TRIANGLES, indices.size(), GL_UNSIGNED_INT, 0);
+	Globals::get().drawCalls++;
 }
 
 
@@ -93,4 +94,5 @@ void SkeletalMesh::DrawShadow(
 
 	// Draw the actual mesh
 	glDrawElements(GL_TRIANGLES, indices.size(), GL_UNSIGNED_INT, 0);
+	Globals::get().drawCalls++;
 }
@@ -16,21 +16,27 @@ public:
 
 	bool _stale;
 	bool _nstale;
+	// bumped by every setter, lets caches notice changes without relying on _stale
+	// (any getMatrix() call clears that)
+	unsigned int version = 0;
 
 	void setTranslation(glm::vec3 trans) {
 		_stale = true;
+		version++;
 		translation = trans;
 	}
 
 	void setRotation(glm::quat rot) {
 		_stale = true;
 		_nstale = true;
+		version++;
 		rotation = rot;
 	}
 
 	void setScale(glm::vec3 sca) {
 		_stale = true;
 		_nstale = true;
+		version++;
 		scale = sca;
 	}
 
@@ -1,4 +1,9 @@
 #include "VAO.h"
+#include "Globals.h"
+
+// last VAO bound through VAO::Bind, only used to count switches
+// (other code binds raw VAOs, so the bind itself is never skipped, see ResetStateCount)
+static GLuint lastVAO = 0;
 
 // Constructor that generates a VAO ID
 VAO::VAO()
@@ -18,6 +23,8 @@ void VAO::LinkAttrib(VBO& VBO, GLuint layout, GLuint numComponents, GLenum type,
 // Binds the VAO
 void VAO::Bind()
 {
+	if (ID != lastVAO) Globals::get().stateChanges++;
+	lastVAO = ID;
 	glBindVertexArray(ID);
 }
 
@@ -33,6 +40,12 @@ void VAO::Delete()
 	glDeleteVertexArrays(1, &ID);
 }
 
+// Forgets the last bound VAO, called at the start of every netghost_redraw
+void VAO::ResetStateCount()
+{
+	lastVAO = 0;
+}
+
 // Constructor that generates a VAO ID
 SkeletalVAO::SkeletalVAO()
 {
@@ -31,6 +31,8 @@ public:
 	void Unbind();
 	// Deletes the VAO
 	void Delete();
+	// Forgets the last bound VAO, the GUI, particles and skybox bind raw VAOs behind its back
+	static void ResetStateCount();
 };
 
 
@@ -8,6 +8,14 @@ VBO::VBO(std::vector<Vertex>& vertices)
 	glBufferData(GL_ARRAY_BUFFER, vertices.size() * sizeof(Vertex), vertices.data(), GL_STATIC_DRAW);
 }
 
+// Constructor that uploads packed vertices straight from memory (no intermediate copy)
+VBO::VBO(const void* data, GLsizeiptr size)
+{
+	glGenBuffers(1, &ID);
+	glBindBuffer(GL_ARRAY_BUFFER, ID);
+	glBufferData(GL_ARRAY_BUFFER, size, data, GL_STATIC_DRAW);
+}
+
 // Binds the VBO
 void VBO::Bind()
 {
@@ -33,6 +33,8 @@ public:
 */
 	// Constructor that generates a Vertex Buffer Object and links it to vertices
 	VBO(std::vector<Vertex>& vertices);
+	// Constructor that uploads packed vertices straight from memory (no intermediate copy)
+	VBO(const void* data, GLsizeiptr size);
 
 	// Binds the VBO
 	void Bind();
@@ -1,4 +1,5 @@
 #include "Wire.h"
+#include "Globals.h"
 
 Wire::Wire(glm::vec3 x_0, glm::vec3 x_1)
 {
@@ -49,4 +50,5 @@ void Wire::Draw(Shader &shader, Camera &camera,
 	glUniformMatrix4fv(glGetUniformLocation(shader.ID, "transform"), 1, GL_FALSE, glm::value_ptr(transform));
 
 	glDrawElements(GL_LINES, 2, GL_UNSIGNED_INT, 0);
+	Globals::get().drawCalls++;
 }
\ No newline at end of file
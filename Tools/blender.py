@@ -60,7 +60,8 @@ if not bpy:
 assert bpy
 
 ## blender imports ##
-import math, mathutils, json
+import math, mathutils, json, time, hashlib
+import numpy
 from http.server import HTTPServer
 from http.server import BaseHTTPRequestHandler
 
@@ -76,6 +77,7 @@ if not os.path.isdir(BUDIR):
 	subprocess.check_call(['make'], cwd=BUDIR)
 
 BASISU = os.path.join(BUDIR, 'bin/basisu')
+BASISU_MODES = ("KTX2", "basis")
 assert os.path.isfile(BASISU)
 
 
@@ -85,86 +87,349 @@ if "--debug" in sys.argv:
 	assert os.path.isfile(builder_script)
 
 ## @bpy
-# dump scene into json file for build.py
+# world space AABB and bounding sphere of a mesh, co is the (n, 3) array of local vertex
+# positions, the engine composes pos/rot/scl the same way as matrix_basis (parents are ignored)
 ##
-def netghost2json():
-	dump = {}
+def get_world_bounds(co, matrix):
+	if not len(co):
+		return None
+	m = numpy.array(matrix, dtype=numpy.float32)
+	world = co @ m[:3, :3].T + m[:3, 3]
+	lo = world.min(axis=0)
+	hi = world.max(axis=0)
+	center = (lo + hi) * 0.5
+	radius = numpy.sqrt(((world - center) ** 2).sum(axis=1).max())
+	return {
+		"aabb": [lo.tolist(), hi.tolist()],
+		"sphere": [center.tolist(), float(radius)],
+	}
+
+## @bpy
+# geometry statistics of a mesh object in world space (matrix_world): AABB, bounding sphere,
+# area weighted surface centroid, triangle count and surface area. computed with numpy from the
+# mesh data build.py exports (modifiers are not applied, so bound_box can not be used) and
+# memoized per object until the depsgraph updates the object or its mesh
+##
+class GeometryStats:
+	cache = {}  ## object name -> stats
+
+	@staticmethod
+	def invalidate(ob=None, mesh=None):
+		if ob:
+			GeometryStats.cache.pop(ob, None)
+		if mesh:
+			for n in [n for n, st in GeometryStats.cache.items() if st["mesh"] == mesh]:
+				del GeometryStats.cache[n]
+
+def geometry_stats(ob):
+	stats = GeometryStats.cache.get(ob.name)
+	if stats is not None:
+		return stats
+	if ob.type != "MESH":
+		raise RuntimeError("not implemented type: %s" % ob.type)
+	mesh = ob.data
+	co = numpy.empty(len(mesh.vertices) * 3, dtype=numpy.float32)
+	mesh.vertices.foreach_get("co", co)
+	mesh.calc_loop_triangles()
+	tris = numpy.empty(len(mesh.loop_triangles) * 3, dtype=numpy.int32)
+	mesh.loop_triangles.foreach_get("vertices", tris)
+
+	m = numpy.array(ob.matrix_world, dtype=numpy.float64)
+	world = co.reshape(-1, 3) @ m[:3, :3].T + m[:3, 3]
+	stats = {"mesh": mesh.name, "tris": len(tris) // 3, "area": 0.0}
+	if not len(world):
+		origin = m[:3, 3].tolist()
+		stats.update(aabb=[origin, origin], sphere=[origin, 0.0], centroid=origin)
+	else:
+		lo = world.min(axis=0)
+		hi = world.max(axis=0)
+		center = (lo + hi) * 0.5
+		stats["aabb"] = [lo.tolist(), hi.tolist()]
+		stats["sphere"] = [center.tolist(), float(numpy.sqrt(((world - center) ** 2).sum(axis=1).max()))]
+		corners = world[tris].reshape(-1, 3, 3)
+		areas = numpy.linalg.norm(numpy.cross(corners[:, 1] - corners[:, 0], corners[:, 2] - corners[:, 0]), axis=1) * 0.5
+		stats["area"] = float(areas.sum())
+		if stats["area"] > 0.0:
+			stats["centroid"] = ((corners.mean(axis=1) * areas[:, None]).sum(axis=0) / stats["area"]).tolist()
+		else:
+			stats["centroid"] = world.mean(axis=0).tolist()
+	GeometryStats.cache[ob.name] = stats
+	return stats
+
+## @bpy
+# bulk mesh export: foreach_get into preallocated numpy buffers and triangles from loop_triangles
+# (quads and n-gons included). with an active uv layer every unique (vertex, uv) corner becomes a
+# vertex, otherwise the mesh vertices are used as they are. returns numpy arrays
+##
+def dump_mesh(mesh):
+	nverts = len(mesh.vertices)
+	co = numpy.empty(nverts * 3, dtype=numpy.float32)
+	mesh.vertices.foreach_get("co", co)
+	normals = numpy.empty(nverts * 3, dtype=numpy.float32)
+	mesh.vertices.foreach_get("normal", normals)
+	co = co.reshape(-1, 3)
+	normals = normals.reshape(-1, 3)
+
+	mesh.calc_loop_triangles()
+	ntris = len(mesh.loop_triangles)
+	if not mesh.uv_layers.active:
+		indices = numpy.empty(ntris * 3, dtype=numpy.uint32)
+		mesh.loop_triangles.foreach_get("vertices", indices)
+		return {"verts": co, "normals": normals, "indices": indices}
+
+	nloops = len(mesh.loops)
+	loops = numpy.empty(ntris * 3, dtype=numpy.uint32)
+	mesh.loop_triangles.foreach_get("loops", loops)
+	loop_verts = numpy.empty(nloops, dtype=numpy.uint32)
+	mesh.loops.foreach_get("vertex_index", loop_verts)
+	uv = numpy.empty(nloops * 2, dtype=numpy.float32)
+	mesh.uv_layers.active.data.foreach_get("uv", uv)
+	corners = numpy.empty(nloops, dtype=[("v", "<u4"), ("u", "<f4"), ("w", "<f4")])
+	corners["v"] = loop_verts
+	corners["u"] = uv[0::2]
+	corners["w"] = uv[1::2]
+	unique, remap = numpy.unique(corners, return_inverse=True)
+	return {
+		"verts": co[unique["v"]],
+		"normals": normals[unique["v"]],
+		"uvs": numpy.stack([unique["u"], unique["w"]], axis=1),
+		"indices": remap.reshape(-1).astype(numpy.uint32)[loops],
+	}
+
+## @Test
+# per-vertex python export (as netghost2json did it before dump_mesh) against dump_mesh,
+# on a grid of about 1M vertices: blender --background --python blender.py -- --benchmark-export
+##
+def benchmark_mesh_export(subdivisions=1000):
+	bpy.ops.mesh.primitive_grid_add(x_subdivisions=subdivisions, y_subdivisions=subdivisions)
+	mesh = bpy.context.active_object.data
+	start = time.time()
+	legacy = {
+		"verts": [(v.co.x, v.co.y, v.co.z) for v in mesh.vertices],
+		"normals": [(v.normal.x, v.normal.y, v.normal.z) for v in mesh.vertices],
+		"indices": [face.vertices[i] for face in mesh.polygons for i in range(3)],
+	}
+	legacy_time = time.time() - start
+	start = time.time()
+	bulk = dump_mesh(mesh)
+	bulk_time = time.time() - start
+	print("mesh export: %d verts, %d polygons" % (len(mesh.vertices), len(mesh.polygons)))
+	print("	per-vertex: %.3fs (%d triangles, quads cut in half)" % (legacy_time, len(legacy["indices"]) // 3))
+	print("	bulk:       %.3fs (%d triangles) %.1fx faster" % (bulk_time, len(bulk["indices"]) // 3, legacy_time / max(bulk_time, 1e-9)))
+	return legacy_time, bulk_time
+
+## @bpy
+# per-object export cache: an object record is rebuilt only when the depsgraph marked the object
+# (or its mesh) dirty or one of its script/shader texts changed, and mesh data is dumped again only
+# for dirty meshes. every record is keyed by a content hash of its transform, mesh data, scripts,
+# shaders and custom props, so exports after the first one write a delta of the changed records
+##
+class ExportCache:
+	objects = {}  ## object name -> {"hash", "record", "mesh", "texts"}
+	meshes = {}  ## mesh name -> {"hash", "data"}
+	texts = {}  ## text name -> hash of its contents
+	dirty = set()
+	dirty_meshes = set()
+	everything = True
+	## last full container written: {"id", "path", "objects": {name: hash}, "meshes": {name: hash}}
+	base = None
+
+	@staticmethod
+	def reset():
+		ExportCache.objects.clear()
+		ExportCache.meshes.clear()
+		ExportCache.texts.clear()
+		ExportCache.dirty.clear()
+		ExportCache.dirty_meshes.clear()
+		ExportCache.everything = True
+		ExportCache.base = None
+
+@bpy.app.handlers.persistent
+def netghost_depsgraph_update(scene, depsgraph):
+	for update in depsgraph.updates:
+		id = update.id.original
+		if isinstance(id, bpy.types.Object):
+			ExportCache.dirty.add(id.name)
+			GeometryStats.invalidate(ob=id.name)
+			if update.is_updated_geometry and id.type == "MESH":
+				ExportCache.dirty_meshes.add(id.data.name)
+				GeometryStats.invalidate(mesh=id.data.name)
+		elif isinstance(id, bpy.types.Mesh):
+			ExportCache.dirty_meshes.add(id.name)
+			GeometryStats.invalidate(mesh=id.name)
+
+@bpy.app.handlers.persistent
+def netghost_load_post(*args):
+	ExportCache.reset()
+	GeometryStats.cache.clear()
+
+## running the script again in the same session replaces the handlers instead of stacking them
+for handlers, handler in (
+	(bpy.app.handlers.depsgraph_update_post, netghost_depsgraph_update),
+	(bpy.app.handlers.load_post, netghost_load_post),
+):
+	for h in [h for h in handlers if h.__name__ == handler.__name__]:
+		handlers.remove(h)
+	handlers.append(handler)
+
+def hash_mesh(data):
+	h = hashlib.sha1()
+	for k in sorted(data):
+		h.update(k.encode())
+		h.update(numpy.ascontiguousarray(data[k]).tobytes())
+	return h.hexdigest()
+
+## "SHADOWS LIGHTS=4" or "SHADOWS, LIGHTS=4" -> {"LIGHTS": "4", "SHADOWS": "1"}
+def glsl_defines(text):
+	defines = {}
+	for item in text.replace(",", " ").split():
+		name, _, value = item.partition("=")
+		defines[name] = value or "1"
+	return defines
+
+## export record of a mesh object, the mesh data itself is referenced by name
+def object_record(ob, mesh):
+	record = {
+		"pos": list(ob.location),
+		"rot": list(ob.rotation_euler),
+		"scl": list(ob.scale),
+		"mesh": ob.data.name,
+		"scripts": [],
+	}
+	texts = set()
+	## used by build.py for the static BVH the generated scene culls against, the engine composes
+	## pos/rot/scl like matrix_basis so parented and constrained objects get their own bounds
+	if ob.parent or ob.constraints:
+		bounds = get_world_bounds(mesh["verts"], ob.matrix_basis)
+	elif len(mesh["verts"]):
+		stats = geometry_stats(ob)
+		bounds = {"aabb": stats["aabb"], "sphere": stats["sphere"]}
+	else:
+		bounds = None
+	if bounds:
+		record.update(bounds)
+	if ob.netghost_glsl_vertex:
+		record["vshader"] = ob.netghost_glsl_vertex.name
+		texts.add(ob.netghost_glsl_vertex.name)
+	if ob.netghost_glsl_fragment:
+		record["fshader"] = ob.netghost_glsl_fragment.name
+		texts.add(ob.netghost_glsl_fragment.name)
+	if ob.netghost_glsl_vertex and ob.netghost_glsl_fragment:
+		sname = ob.netghost_glsl_vertex.name + ob.netghost_glsl_fragment.name
+		defines = glsl_defines(ob.netghost_glsl_defines)
+		if defines:
+			## each set of defines is its own shader variant
+			record["defines"] = defines
+			sname += "".join("_%s%s" % (k, defines[k] if defines[k] != "1" else "") for k in sorted(defines))
+		record["shader"] = sname.replace(".", "_").replace("-", "_").replace("+", "_")
+
+	if ob.parent:
+		record["parent"] = ob.parent.name
+	if ob.netghost_lod_count > 1:
+		record["lod"] = {
+			"count": ob.netghost_lod_count,
+			"ratio": ob.netghost_lod_ratio,
+			"screen": list(ob.netghost_lod_screen)[: ob.netghost_lod_count - 1],
+		}
+	if ob.active_material:
+		## only used to sort the generated render queue for now
+		record["material"] = ob.active_material.name
+	for i in range(MAX_SCRIPTS_PER_OBJECT):
+		txt = getattr(ob, "netghost_script" + str(i))
+		if txt:
+			record["scripts"].append(txt.as_string())
+			texts.add(txt.name)
+	if ob.keys():
+		record["props"] = {}
+		props = {}
+		for k in ob.keys():
+			if (
+				type(ob[k]) is float
+			):  ## GOTCHA, there is other blender DNA/RNA hacks here
+				props[k] = ob[k]
+		if props:
+			record["props"] = props
+	return record, texts
+
+## brings the cache up to date with the blend file, returns the names of the re-dumped objects
+def update_export_cache():
+	cache = ExportCache
+	texts = {txt.name: hashlib.sha1(txt.as_string().encode()).hexdigest() for txt in bpy.data.texts}
+	changed_texts = set(n for n in texts if cache.texts.get(n) != texts[n]) | (set(cache.texts) - set(texts))
+	cache.texts = texts
+
+	meshes = {}
+	redumped = []
+	for ob in bpy.data.objects:
+		if ob.type != "MESH":
+			continue
+		mname = ob.data.name
+		if mname not in meshes:
+			meshes[mname] = cache.meshes.get(mname)
+			if meshes[mname] is None or cache.everything or mname in cache.dirty_meshes:
+				print("dumping mesh data:", mname)
+				## linked duplicates share the datablock, its geometry is dumped once
+				data = dump_mesh(ob.data)
+				meshes[mname] = {"hash": hash_mesh(data), "data": data}
+		entry = cache.objects.get(ob.name)
+		if (
+			entry is None
+			or cache.everything
+			or ob.name in cache.dirty
+			or entry["mesh"] != meshes[mname]["hash"]
+			or entry["texts"] & changed_texts
+		):
+			record, obtexts = object_record(ob, meshes[mname]["data"])
+			key = json.dumps(record, sort_keys=True) + meshes[mname]["hash"]
+			key = hashlib.sha1(key.encode()).hexdigest()
+			if entry is None or entry["hash"] != key:
+				print("dumping mesh:", ob)
+				redumped.append(ob.name)
+			cache.objects[ob.name] = {"hash": key, "record": record, "mesh": meshes[mname]["hash"], "texts": obtexts}
+
+	for n in set(cache.objects) - set(ob.name for ob in bpy.data.objects if ob.type == "MESH"):
+		del cache.objects[n]
+	cache.meshes = meshes
+	cache.dirty.clear()
+	cache.dirty_meshes.clear()
+	cache.everything = False
+	return redumped
+
+## cameras, lights, shaders and javascript are small and always exported whole
+def scene_info(objects, meshes):
 	camdump = {}
 	lightdump = {}
-	shaders = {}
-	vshaders = {}
-	fshaders = {}
 	for ob in bpy.data.objects:
 		if ob.type == "CAMERA":
-			print("dumping camera:", ob)
 			camdump[ob.name] = {
 				"pos": list(ob.location),
 				"rot": list(ob.rotation_euler),
 				"scripts": [],
 			}
 		if ob.type == "LIGHT":
-			print("dumping light:", ob)
 			lightdump[ob.name] = {
 				"pos": list(ob.location),
 				"scripts": [],
 			}
-		if ob.type == "MESH":
-			print("dumping mesh:", ob)
-			dump[ob.name] = {
-				"pos": list(ob.location),
-				"rot": list(ob.rotation_euler),
-				"scl": list(ob.scale),
-				"verts": [(v.co.x, v.co.y, v.co.z) for v in ob.data.vertices],
-				"normals": [
-					(v.normal.x, v.normal.y, v.normal.z) for v in ob.data.vertices
-				],
-				"indices": [],
-				"scripts": [],
+	shaders = {}
+	vshaders = {}
+	fshaders = {}
+	for entry in ExportCache.objects.values():
+		record = entry["record"]
+		if "vshader" in record:
+			vshaders[record["vshader"]] = bpy.data.texts[record["vshader"]].as_string()
+		if "fshader" in record:
+			fshaders[record["fshader"]] = bpy.data.texts[record["fshader"]].as_string()
+		if "shader" in record:
+			shaders[record["shader"]] = {
+				"vert": vshaders[record["vshader"]],
+				"frag": fshaders[record["fshader"]],
 			}
-			if ob.netghost_glsl_vertex:
-				txt = ob.netghost_glsl_vertex
-				if txt.name not in vshaders:
-					vshaders[txt.name] = txt.as_string()
-				dump[ob.name]["vshader"] = txt.name
-			if ob.netghost_glsl_fragment:
-				txt = ob.netghost_glsl_fragment
-				if txt.name not in fshaders:
-					fshaders[txt.name] = txt.as_string()
-				dump[ob.name]["fshader"] = txt.name
-
-			if ob.netghost_glsl_vertex and ob.netghost_glsl_fragment:
-				sname = ob.netghost_glsl_vertex.name + ob.netghost_glsl_fragment.name
-				sname = sname.replace(".", "_").replace("-", "_").replace("+", "_")
-				if sname not in shaders:
-					shaders[sname] = {
-						"vert": ob.netghost_glsl_vertex.as_string(),
-						"frag": ob.netghost_glsl_fragment.as_string(),
-					}
-				dump[ob.name]["shader"] = sname
-
-			if ob.parent:
-				dump[ob.name]["parent"] = ob.parent.name
-			for face in ob.data.polygons:
-				for i in range(3):
-					dump[ob.name]["indices"].append(face.vertices[i])
-			for i in range(MAX_SCRIPTS_PER_OBJECT):
-				txt = getattr(ob, "netghost_script" + str(i))
-				if txt:
-					dump[ob.name]["scripts"].append(txt.as_string())
-			if ob.keys():
-				dump[ob.name]["props"] = {}
-				props = {}
-				for k in ob.keys():
-					if (
-						type(ob[k]) is float
-					):  ## GOTCHA, there is other blender DNA/RNA hacks here
-						props[k] = ob[k]
-				if props:
-					dump[ob.name]["props"] = props
-
-	print(dump)
+			if "defines" in record:
+				shaders[record["shader"]]["defines"] = record["defines"]
 	info = 	{
-			"objects": dump,
+			"objects": objects,
+			"meshes": meshes,
 			"cameras": camdump,
 			"lights": lightdump,
 			"vshaders": vshaders,
@@ -175,8 +440,144 @@ def netghost2json():
 		js = bpy.data.worlds[0].netghost_javascript.as_string()
 		print(js)
 		info['javascript'] = js
+	return info
+
+## @bpy
+# dump scene for build.py
+##
+def netghost_scene():
+	redumped = update_export_cache()
+	print("export: %s objects, %s dumped" % (len(ExportCache.objects), len(redumped)))
+	objects = {n: ExportCache.objects[n]["record"] for n in ExportCache.objects}
+	meshes = {n: ExportCache.meshes[n]["data"] for n in ExportCache.meshes}
+	return scene_info(objects, meshes)
+
+## only the records that differ from the last full container, plus the names of removed objects
+def netghost_scene_delta():
+	redumped = update_export_cache()
+	base = ExportCache.base
+	objects = {}
+	meshes = {}
+	for n, entry in ExportCache.objects.items():
+		if base["objects"].get(n) != entry["hash"]:
+			objects[n] = entry["record"]
+			mname = entry["record"]["mesh"]
+			if base["meshes"].get(mname) != ExportCache.meshes[mname]["hash"]:
+				meshes[mname] = ExportCache.meshes[mname]["data"]
+	print("export: %s objects, %s dumped, %s in delta" % (len(ExportCache.objects), len(redumped), len(objects)))
+	info = scene_info(objects, meshes)
+	info["delta"] = {
+		"base": base["id"],
+		"path": base["path"],
+		"removed": sorted(set(base["objects"]) - set(ExportCache.objects)),
+	}
+	return info
+
+## text dump, kept for debugging (blender.py -- --dump-json)
+def netghost2json():
+	info = netghost_scene()
+	meshes = info["meshes"]
+	info["meshes"] = {
+		name: {k: meshes[name][k].tolist() for k in meshes[name]} for name in meshes
+	}
 	return json.dumps(info)
 
+## @bpy
+# binary scene container read by build.py read_scene_dump(): magic, version, header size, a JSON header
+# padded to SCENE_ALIGN, then little-endian typed array sections aligned to SCENE_ALIGN. arrays in
+# the header are {"section": i}, object pos/rot/scl go to one (objects, 9) float32 section
+##
+SCENE_MAGIC = b"NGSCENE\0"
+SCENE_VERSION = 1
+SCENE_ALIGN = 16  ## must match build.py
+## a delta is written while it holds less than this fraction of the objects, else a new full container
+SCENE_DELTA_RATIO = 0.25
+
+def netghost2bin(info=None):
+	if info is None:
+		info = netghost_scene()
+	info = dict(info)
+	arrays = []
+
+	def section(a, dtype):
+		arrays.append(numpy.ascontiguousarray(a, dtype=dtype))
+		return {"section": len(arrays) - 1}
+
+	info["meshes"] = {
+		name: {k: section(mesh[k], "<u4" if k == "indices" else "<f4") for k in mesh}
+		for name, mesh in info["meshes"].items()
+	}
+	names = list(info["objects"])
+	transforms = numpy.zeros((len(names), 9), dtype=numpy.float32)
+	objects = {}
+	for i, n in enumerate(names):
+		ob = info["objects"][n]
+		transforms[i] = ob["pos"] + ob["rot"] + ob["scl"]
+		objects[n] = {k: ob[k] for k in ob if k not in ("pos", "rot", "scl")}
+	info["objects"] = objects
+	info["transforms"] = dict(section(transforms, "<f4"), objects=names)
+
+	## section offsets depend on the header size and the header lists the offsets, so the
+	## header is sized with placeholder offsets of the final width first
+	def header(offsets):
+		info["sections"] = [
+			{"offset": offsets[i], "dtype": a.dtype.str, "shape": list(a.shape)}
+			for i, a in enumerate(arrays)
+		]
+		return json.dumps(info).encode()
+
+	align = lambda n: (n + SCENE_ALIGN - 1) // SCENE_ALIGN * SCENE_ALIGN
+	size = len(header([0xFFFFFFFFFFFF] * len(arrays)))
+	offsets = []
+	end = align(16 + size)
+	for a in arrays:
+		offsets.append(end)
+		end = align(end + a.nbytes)
+	head = header(offsets)
+	head += b" " * (align(16 + len(head)) - 16 - len(head))
+	out = bytearray(end)
+	out[0:16] = SCENE_MAGIC + SCENE_VERSION.to_bytes(4, "little") + len(head).to_bytes(4, "little")
+	out[16 : 16 + len(head)] = head
+	for off, a in zip(offsets, arrays):
+		out[off : off + a.nbytes] = a.tobytes()
+	return out
+
+## scene_id in the header of a full container, None when path is not one
+def read_scene_id(path):
+	with open(path, "rb") as f:
+		head = f.read(16)
+		if len(head) < 16 or head[:8] != SCENE_MAGIC or int.from_bytes(head[8:12], "little") != SCENE_VERSION:
+			return None
+		try:
+			return json.loads(f.read(int.from_bytes(head[12:16], "little"))).get("scene_id")
+		except ValueError:
+			return None
+
+## writes a full container to path, or a delta against it (path with .delta.ngs) once one was
+## written in this session and few objects changed since. another worker or blender session can
+## rewrite the same path, so the delta is only made while the file on disk is still our base.
+## returns the file to hand to build.py
+def write_scene(path):
+	path = os.path.abspath(path)
+	base = ExportCache.base
+	if base and base["path"] == path and os.path.isfile(path) and read_scene_id(path) == base["id"]:
+		info = netghost_scene_delta()
+		changed = len(info["objects"]) + len(info["delta"]["removed"])
+		if changed <= SCENE_DELTA_RATIO * max(1, len(ExportCache.objects)):
+			delta = path[: -len(".ngs")] + ".delta.ngs"
+			open(delta, "wb").write(netghost2bin(info))
+			return delta
+	info = netghost_scene()
+	info["scene_id"] = "%x" % time.time_ns()
+	open(path, "wb").write(netghost2bin(info))
+	ExportCache.base = {
+		"id": info["scene_id"],
+		"path": path,
+		"objects": {n: e["hash"] for n, e in ExportCache.objects.items()},
+		"meshes": {n: m["hash"] for n, m in ExportCache.meshes.items()},
+	}
+	return path
+
 ## @Test
 # possibly included code
 ##
@@ -195,18 +596,99 @@ def test():
 	txt.from_string(TEST_GLSL_FRAG)
 	ob.netghost_glsl_fragment = txt
 
+## @main
+# persistent headless worker for build.py (blender.py --worker=SOCKET): one JSON job per connection,
+# answered with a JSON line and the payload bytes. the requested .blend is only loaded again when it
+# is not the open file or changed on disk, so the export cache also survives between dumps
+##
+WORKER_SOCKET = "/tmp/netghost-blender.sock"
+
+def worker_load(blend, loaded):
+	key = (blend, os.path.getmtime(blend) if blend else None)
+	if key != loaded:
+		print("worker loading:", blend or "startup file")
+		if blend:
+			bpy.ops.wm.open_mainfile(filepath=blend)
+		else:
+			bpy.ops.wm.read_homefile()
+	return key
+
+def worker_run(job):
+	if job["job"] == "dump":
+		if job.get("format") == "json":
+			open(job["path"], "w").write(netghost2json())
+			return {"path": job["path"]}, b""
+		return {"path": write_scene(job["path"])}, b""
+	if job["job"] == "render":
+		png = netghost.render(job["object"], job.get("width", 128), job.get("height", 128), job.get("zoom", 3))
+		return {}, png
+	if job["job"] == "convert":
+		mode = job.get("mode", "KTX2")
+		if mode not in BASISU_MODES:
+			raise ValueError("convert: unsupported mode %s, one of %s" % (mode, ", ".join(BASISU_MODES)))
+		return {}, netghost.basisu(job["input"], mode, job.get("compression", 3))
+	raise RuntimeError("unknown job: %s" % job["job"])
+
+def worker(path=WORKER_SOCKET):
+	import socket, traceback
+	if os.path.exists(path):
+		os.unlink(path)
+	server = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+	server.bind(path)
+	server.listen(8)
+	print("netghost worker listening:", path)
+	loaded = None
+	while True:
+		conn, _ = server.accept()
+		with conn:
+			try:
+				job = json.loads(conn.makefile("rb").readline())
+				if job["job"] == "quit":
+					conn.sendall(b'{"ok": true}\n')
+					break
+				loaded = worker_load(job.get("blend"), loaded)
+				reply, payload = worker_run(job)
+				reply["ok"] = True
+				if job["job"] == "render":
+					## render moves the camera and hides objects, the next job reloads the file
+					loaded = None
+			except Exception:
+				reply, payload = {"ok": False, "error": traceback.format_exc()}, b""
+				loaded = None
+			reply["size"] = len(payload)
+			try:
+				conn.sendall(json.dumps(reply).encode() + b"\n" + payload)
+			except OSError as err:
+				print("worker: client went away:", err)
+	server.close()
+	os.unlink(path)
+
 ## @main
 # basic logic for main
 ##
 def flagloop():
 	if __name__ == "__main__":
-		if "--dump" in sys.argv:
+		if "--dump-json" in sys.argv:
 			tmpj = "/tmp/dump.json"
 			open(tmpj, "w").write(netghost2json())
 
+		elif "--dump" in sys.argv:
+			write_scene("/tmp/dump.ngs")
+
 		elif "--test" in sys.argv:
 			test()
 
+		elif "--benchmark-export" in sys.argv:
+			benchmark_mesh_export()
+
+		elif "--worker" in sys.argv:
+			worker()
+
+		else:
+			for arg in sys.argv:
+				if arg.startswith("--worker="):
+					worker(arg.split("=", 1)[1])
+
 ## @bpy
 # define modifications to bpy to include on startup
 ##
@@ -236,6 +718,9 @@ bpy.types.Object.netghost_glsl_vertex = bpy.props.PointerProperty(
 bpy.types.Object.netghost_glsl_fragment = bpy.props.PointerProperty(
 	name="fragment shader", type=bpy.types.Text
 )
+bpy.types.Object.netghost_glsl_defines = bpy.props.StringProperty(
+	name="defines", description="shader variant defines, eg: SHADOWS LIGHTS=4"
+)
 
 bpy.types.Object.netghost_spawnable = bpy.props.BoolProperty(name="spawnable")
 bpy.types.Object.netghost_owner = bpy.props.PointerProperty(
@@ -255,6 +740,19 @@ bpy.types.Object.netghost_fri_r = bpy.props.BoolProperty(name="readable")
 bpy.types.Object.netghost_fri_w = bpy.props.BoolProperty(name="writeable")
 bpy.types.Object.netghost_fri_x = bpy.props.BoolProperty(name="executable")
 
+## LOD chain generated by build.py, a level is used once the object covers less than
+## its screen size (fraction of the screen height) on screen
+MAX_LODS = 4
+bpy.types.Object.netghost_lod_count = bpy.props.IntProperty(
+	name="LOD levels", default=1, min=1, max=MAX_LODS
+)
+bpy.types.Object.netghost_lod_ratio = bpy.props.FloatProperty(
+	name="triangles kept per level", default=0.5, min=0.05, max=0.95
+)
+bpy.types.Object.netghost_lod_screen = bpy.props.FloatVectorProperty(
+	name="screen size", size=MAX_LODS - 1, default=(0.5, 0.25, 0.1), min=0.0, max=1.0
+)
+
 class netghost:
 	servers = []
 	@staticmethod
@@ -312,10 +810,11 @@ class netghost:
 		if mode=="KTX2":
 			cmd.append('-ktx2')
 			tmp = input[:-4] + '.ktx2'
-		else:
-			assert output.endswith('.basis')
+		elif mode=="basis":
 			cmd.append('-uastc')
 			tmp = input[:-4] + '.basis'
+		else:
+			raise ValueError('unsupported basisu mode: %s (one of %s)' % (mode, ', '.join(BASISU_MODES)))
 		assert compression <= 5
 		cmd.append('-comp_level')
 		cmd.append(str(compression))
@@ -399,6 +898,25 @@ class NetGhostGLSLPanel(bpy.types.Panel):
 		self.layout.label(text="Attach GLSL Shaders")
 		self.layout.prop(context.active_object, "netghost_glsl_vertex")
 		self.layout.prop(context.active_object, "netghost_glsl_fragment")
+		self.layout.prop(context.active_object, "netghost_glsl_defines")
+
+
+@bpy.utils.register_class
+class NetGhostLODPanel(bpy.types.Panel):
+	bl_idname = "OBJECT_PT_NetGhost_LOD_Panel"
+	bl_label = "NetGhost LOD"
+	bl_space_type = "PROPERTIES"
+	bl_region_type = "WINDOW"
+	bl_context = "object"
+
+	def draw(self, context):
+		if not context.active_object or context.active_object.type != "MESH":
+			return
+		self.layout.prop(context.active_object, "netghost_lod_count")
+		if context.active_object.netghost_lod_count > 1:
+			self.layout.prop(context.active_object, "netghost_lod_ratio")
+			for i in range(context.active_object.netghost_lod_count - 1):
+				self.layout.prop(context.active_object, "netghost_lod_screen", index=i, text="LOD %s below" % (i + 1))
 
 
 @bpy.utils.register_class
@@ -436,8 +954,7 @@ class NetGhostExport(bpy.types.Operator):
 		return True
 
 	def execute(self, context):
-		tmpj = "/tmp/b2ghost.json"
-		open(tmpj, "w").write(netghost2json())
+		tmpj = write_scene("/tmp/b2ghost.ngs")
 		cmd = ["python3", "./build.py", tmpj]
 		print(cmd, _thisdir)
 		subprocess.check_call(cmd, cwd=_thisdir)
@@ -454,8 +971,7 @@ class NetGhostExportWasm(bpy.types.Operator):
 		return True
 
 	def execute(self, context):
-		tmpj = "/tmp/b2ghost.json"
-		open(tmpj, "w").write(netghost2json())
+		tmpj = write_scene("/tmp/b2ghost.ngs")
 		cmd = ["python3", "./build.py", "--wasm", tmpj, "--output=/tmp/test.html"]
 		print(cmd, _thisdir)
 		subprocess.check_call(cmd, cwd=_thisdir)
@@ -522,25 +1038,10 @@ class NetGhostWorldPanel(bpy.types.Panel):
 		self.layout.operator("netghost.simple_server", icon="CONSOLE")
 
 
-## from HolyBlender
+## from HolyBlender, (center, size) of the world AABB
 def get_object_bounds(obj) -> (mathutils.Vector, mathutils.Vector):
-	_min = mathutils.Vector((float('inf'), float('inf'), float('inf')))
-	_max = mathutils.Vector((float('-inf'), float('-inf'), float('-inf')))
-	## note: blender already has object bounds that is more acurate than below,
-	## because the blender cached bbox should take into account modifiers, see obj.dimensions
-	## https://blender.stackexchange.com/questions/8459/get-blender-x-y-z-and-bounding-box-with-script
-	## TODO, below is very slow on big meshes, this needs rewrite
-	if obj.type == 'MESH':
-		for vertex in obj.data.vertices:
-			_min.x = min((obj.matrix_world @ vertex.co).x, _min.x)
-			_min.y = min((obj.matrix_world @ vertex.co).y, _min.y)
-			_min.z = min((obj.matrix_world @ vertex.co).z, _min.z)
-			_max.x = max((obj.matrix_world @ vertex.co).x, _max.x)
-			_max.y = max((obj.matrix_world @ vertex.co).y, _max.y)
-			_max.z = max((obj.matrix_world @ vertex.co).z, _max.z)
-	else:
-		raise RuntimeError('not implemented type: %s' % obj.type)
-	return ((_min + _max) / 2, _max - _min)
+	lo, hi = [mathutils.Vector(v) for v in geometry_stats(obj)["aabb"]]
+	return ((lo + hi) / 2, hi - lo)
 
 
 
@@ -1,5 +1,10 @@
 #!/usr/bin/python3
-import os, sys, subprocess, ctypes, time, json
+import os, sys, subprocess, ctypes, time, json, threading, hashlib, array, re, contextlib, itertools, math, heapq, mmap, struct
+from concurrent.futures import ThreadPoolExecutor
+try:
+	import numpy
+except ImportError:
+	numpy = None  ## optional, only the mesh optimization stage needs it
 
 ## Supported by: @ObeliskCode & @brentharts
 
@@ -8,6 +13,26 @@ import os, sys, subprocess, ctypes, time, json
 # Setup simple local structures into global (stack) memory
 ##
 NGHOST_LOCAL_VARS = """
+// loop modes, picked with -DNGHOST_LOOP_MODE (build.py --loop=variable|fixed|tick) or netghost_set_loop_mode
+#define NGHOST_LOOP_VARIABLE 0 // tick once delta >= deltaTime, draw every frame (late ticks are dropped)
+#define NGHOST_LOOP_FIXED 1 // fixed timestep accumulator, several ticks per frame to catch up
+#define NGHOST_LOOP_TICK_ONLY 2 // fixed timestep, no rendering, sleeps between ticks (headless servers)
+#ifndef NGHOST_LOOP_MODE
+#define NGHOST_LOOP_MODE NGHOST_LOOP_VARIABLE
+#endif
+#ifndef NGHOST_TICK_RATE
+#define NGHOST_TICK_RATE 188.0
+#endif
+#ifndef NGHOST_FRAME_CAP
+#define NGHOST_FRAME_CAP 0.0 // max frames per second, 0 = uncapped
+#endif
+#ifndef NGHOST_RENDER_DIVISOR
+#define NGHOST_RENDER_DIVISOR 1 // draw every Nth frame
+#endif
+#ifndef NGHOST_MAX_CATCHUP
+#define NGHOST_MAX_CATCHUP 8 // ticks per frame before the backlog is dropped
+#endif
+
 GLFWwindow *window;
 double crntTime = 0.0;
 double timeStart = -1.0;
@@ -15,11 +40,16 @@ double prevTime = timeStart;
 double timeDiff;
 unsigned int counter = 0;
 double lastFrame = timeStart;
-double deltaTime = 1.0 / 188.0;
+double deltaTime = 1.0 / NGHOST_TICK_RATE;
 double frameTime = 0.0f;
 double lastTick = timeStart;
 double thisTick = 0.0;
 double delta;
+int loopMode = NGHOST_LOOP_MODE;
+double frameCap = NGHOST_FRAME_CAP;
+unsigned int renderDivisor = NGHOST_RENDER_DIVISOR;
+double accumulator = 0.0;
+unsigned long frameIndex = 0;
 """
 
 
@@ -30,6 +60,14 @@ NGHOST_GLFW = """
 extern "C" void netghost_window_close(){
 	glfwTerminate();
 }
+
+// a reloaded scene module takes over the window of the previous one
+extern "C" void *netghost_get_window(){
+	return window;
+}
+extern "C" void netghost_set_window(void *w){
+	window = (GLFWwindow *)w;
+}
 EMSCRIPTEN_KEEPALIVE
 extern "C" void netghost_window_init(int w, int h) {
 	glfwInit();
@@ -82,16 +120,66 @@ extern "C" void netghost_window_init(int w, int h) {
 # starts the main C++ run loop to be interopted with (to be ported to zig!)
 ##
 NGHOST_RUN = """
-extern "C" void netghost_run(){
-	GenScene *dp = new GenScene();
-	Scene *bp = dp;
+GenScene *dp = nullptr;
+Scene *bp = nullptr;
+
+extern "C" void netghost_run_init(){
+	dp = new GenScene();
+	bp = dp;
 
 	bp->setupCallbacks(window);
 	bp->loadResources(window);
 
-	/* Main Game Loop */
-	while (!glfwWindowShouldClose(window))
+	lastFrame = lastTick = glfwGetTime();
+	accumulator = 0.0;
+}
+
+// per-phase frame times of the last frames (see Profiler.h), oldest frame first:
+// PHASE_COUNT cpu ms then PHASE_COUNT gpu ms per frame
+EMSCRIPTEN_KEEPALIVE
+extern "C" const float *netghost_get_frame_stats(){
+	unsigned int frames;
+	return Profiler::get().getStats(frames);
+}
+EMSCRIPTEN_KEEPALIVE
+extern "C" unsigned int netghost_get_frame_count(){
+	unsigned int frames;
+	Profiler::get().getStats(frames);
+	return frames;
+}
+EMSCRIPTEN_KEEPALIVE
+extern "C" const char *netghost_get_profile_phase(unsigned int i){
+	return Profiler::phaseName(i);
+}
+
+EMSCRIPTEN_KEEPALIVE
+extern "C" void netghost_set_loop_mode(int mode){
+	loopMode = mode;
+	accumulator = 0.0;
+}
+EMSCRIPTEN_KEEPALIVE
+extern "C" void netghost_set_tick_rate(double hz){
+	if (!(hz > 0.0) || std::isinf(hz)) {
+		std::cout << "netghost_set_tick_rate: ignoring " << hz << ", the tick rate has to be above 0 Hz" << std::endl;
+		return;
+	}
+	deltaTime = 1.0 / hz;
+}
+EMSCRIPTEN_KEEPALIVE
+extern "C" void netghost_set_frame_cap(double fps){
+	frameCap = fps;
+}
+EMSCRIPTEN_KEEPALIVE
+extern "C" void netghost_set_render_divisor(unsigned int n){
+	renderDivisor = n ? n : 1;
+}
+
+// one iteration of the main loop, returns 0 once the window should close
+extern "C" int netghost_frame(){
+	if (glfwWindowShouldClose(window))
+		return 0;
 	{
+		Profiler::get().beginFrame();
 		crntTime = glfwGetTime();
 
 		/* FPS counter */
@@ -115,22 +203,67 @@ extern "C" void netghost_run(){
 		frameTime = crntTime - lastFrame;
 		lastFrame = crntTime;
 
-		thisTick = glfwGetTime();
-		delta = thisTick - lastTick;
+		if (loopMode == NGHOST_LOOP_VARIABLE)
+		{
+			thisTick = glfwGetTime();
+			delta = thisTick - lastTick;
 
-		if (delta >= deltaTime)
+			if (delta >= deltaTime)
+			{
+				NGHOST_PROFILE(PHASE_TICK);
+				lastTick = thisTick;
+				bp->tick(window, delta);
+			}
+		}
+		else
 		{
-			lastTick = thisTick;
-			bp->tick(window, delta);
+			// the simulation always advances by deltaTime, a long frame runs several ticks
+			accumulator += frameTime;
+			int ticks = 0;
+			while (accumulator >= deltaTime && ticks < NGHOST_MAX_CATCHUP)
+			{
+				NGHOST_PROFILE(PHASE_TICK);
+				bp->tick(window, deltaTime);
+				accumulator -= deltaTime;
+				ticks++;
+			}
+			if (accumulator >= deltaTime)
+				accumulator = fmod(accumulator, deltaTime); // too far behind, drop the backlog
 		}
 
-		bp->drawFrame(window, frameTime);
+		frameIndex++;
+		if (loopMode != NGHOST_LOOP_TICK_ONLY && frameIndex % renderDivisor == 0)
+			bp->drawFrame(window, frameTime);
+		Profiler::get().endFrame();
+
+	#ifndef EMSCRIPTEN
+		// the browser paces frames itself, native builds sleep off the rest of the frame
+		double wait = 0.0;
+		if (loopMode == NGHOST_LOOP_TICK_ONLY)
+			wait = deltaTime - accumulator;
+		else if (frameCap > 0.0)
+			wait = 1.0 / frameCap - (glfwGetTime() - crntTime);
+		if (wait > 0.0)
+			std::this_thread::sleep_for(std::chrono::duration<double>(wait));
+	#endif
 	}
+	return 1;
+}
 
+extern "C" void netghost_run_cleanup(){
 	bp->cleanup();
 
 	glfwTerminate();
 }
+
+extern "C" void netghost_run(){
+	netghost_run_init();
+
+	/* Main Game Loop */
+	while (netghost_frame()) {}
+
+	netghost_run_cleanup();
+}
 """
 
 
@@ -138,6 +271,8 @@ extern "C" void netghost_run(){
 # global definition of blender generated scene
 ##
 NGHOST_DERIVED_SCENE = """
+extern "C" void netghost_redraw(); // generated with the scene: cull, lod, draw queue, instances and scripts
+
 class GenScene : public Scene
 {
 public:
@@ -209,6 +344,7 @@ public:
 	int drawFrame(GLFWwindow *window, double frameTime) override
 	{
 		renderScene();
+		netghost_redraw();
 
 		glEnable(GL_BLEND);
 		gui.RenderText(textProgram, "Obelisk Engine", (globals.screenWidth / 2) - 150.0f, globals.screenHeight - (globals.screenHeight / 10), 0.75f, glm::vec3(1.f, 1.f, 1.f));
@@ -431,25 +567,368 @@ int main(void)
 
 
 ## @GenMain
-#
+# GLSL pipeline stage, replaces the old line based minify():
+# resolves #include "x.glsl" from ./Resources/shaders, evaluates #if/#ifdef for the known
+# #define variants (driver macros like GL_ES are left to the driver), strips comments,
+# unreachable functions and unused uniforms, minifies and optionally shortens local and
+# function names (--glsl-shorten), uniforms/attributes/varyings keep their names
 ##
-def minify(f):
+GLSL_PP_VERSION = 1  ## bump to invalidate the cache when the output changes
+GLSL_TOKENS = re.compile(
+	r"(?P<pp>^[ \t]*#[^\n]*)|(?P<id>[A-Za-z_]\w*)"
+	r"|(?P<num>(?:\d+\.?\d*|\.\d+)(?:[eE][-+]?\d+)?[fFuU]?)"
+	r"|(?P<op>\+\+|--|&&|\|\||\^\^|<<=|>>=|<<|>>|[-+*/%<>=!&|^]=|[-+*/%<>=!&|^~?:;,.(){}\[\]])"
+	r"|(?P<ws>\s+)",
+	re.M,
+)
+GLSL_TYPES = re.compile(r"^(void|bool|int|uint|float|double|[biud]?vec[234]|d?mat[234](x[234])?|[iu]?sampler\w+|[iu]?image\w+)$")
+GLSL_KEYWORDS = set("""
+	if else for while do in out inout return break continue discard switch case default struct
+	true false const uniform attribute varying layout centroid flat smooth noperspective
+	precision highp mediump lowp invariant buffer shared main
+""".split())
+_glsl_memo = {}
+
+def glsl_builtin_macro(name):
+	return name.startswith(("GL_", "__"))
+
+## True/False, or None when the expression depends on something only the driver knows
+def glsl_eval_if(expr, macros, uncertain):
+	def known(name):
+		if glsl_builtin_macro(name) or name in uncertain:
+			raise ValueError(name)
+		return name
+	try:
+		expr = re.sub(r"defined\s*\(?\s*(\w+)\s*\)?", lambda m: " %d " % (known(m.group(1)) in macros), expr)
+		expr = re.sub(r"[A-Za-z_]\w*", lambda m: " %s " % (macros.get(known(m.group(0))) or 0), expr)
+	except ValueError:
+		return None
+	expr = re.sub(r"!(?!=)", " not ", expr.replace("&&", " and ").replace("||", " or "))
+	if not re.fullmatch(r"(\s|\d+|[()+\-*/<>=!]|and|or|not)*", expr):
+		return None
+	try:
+		return bool(eval(expr, {"__builtins__": {}}))
+	except Exception:
+		return None
+
+## an #if chain is left to the driver as a whole when one of its #elif tests a driver macro
+## before a branch is known to be taken (#if FOO ... #elif defined(GL_ES) ...)
+def glsl_chain_uncertain(lines, i, cond, macros, uncertain):
+	if cond:
+		return False
+	depth = 0
+	for ln in lines[i + 1 :]:
+		m = re.match(r"\s*#\s*(\w+)\s*(.*)", ln)
+		d = m.group(1) if m else None
+		if d in ("if", "ifdef", "ifndef"):
+			depth += 1
+		elif d == "endif":
+			if depth == 0:
+				return False
+			depth -= 1
+		elif d == "elif" and depth == 0:
+			cond = glsl_eval_if(m.group(2).strip(), macros, uncertain)
+			if cond is None:
+				return True
+			if cond:
+				return False
+	return False
+
+def glsl_lines(glsl, macros, uncertain, seen, out):
+	## stack entries: "keep", "skip" or "pass" (left for the driver), plus whether a branch was taken
+	stack = []
+	lines = glsl.splitlines()
+	for i, ln in enumerate(lines):
+		s = ln.strip()
+		active = all(mode != "skip" for mode, taken in stack)
+		passing = any(mode == "pass" for mode, taken in stack)
+		m = re.match(r"#\s*(\w+)\s*(.*)", s)
+		d, arg = (m.group(1), m.group(2).strip()) if m else (None, "")
+		if d in ("if", "ifdef", "ifndef"):
+			if not active:
+				stack.append(("skip", True))
+				continue
+			if passing:
+				stack.append(("pass", True))
+				out.append(s)
+				continue
+			if d == "if":
+				cond = glsl_eval_if(arg, macros, uncertain)
+			elif glsl_builtin_macro(arg) or arg in uncertain:
+				cond = None
+			else:
+				cond = (arg in macros) == (d == "ifdef")
+			if cond is None or glsl_chain_uncertain(lines, i, cond, macros, uncertain):
+				stack.append(("pass", True))
+				out.append(s)
+			else:
+				stack.append(("keep" if cond else "skip", cond))
+		elif d in ("elif", "else", "endif"):
+			if not stack:
+				raise SyntaxError("GLSL: #%s without #if" % d)
+			mode, taken = stack[-1]
+			if mode == "pass":
+				out.append(s)
+				if d == "endif":
+					stack.pop()
+				continue
+			if d == "endif":
+				stack.pop()
+				continue
+			outer = all(md != "skip" for md, t in stack[:-1])
+			if d == "else":
+				cond = not taken
+			else:
+				cond = glsl_eval_if(arg, macros, uncertain) if not taken else False
+				if cond is None:
+					raise SyntaxError("GLSL: #elif on a driver macro is not supported: %s" % s)
+			stack[-1] = ("keep" if cond and outer else "skip", taken or cond)
+		elif not active:
+			continue
+		elif d == "include":
+			name = arg.strip('"<>')
+			if name in seen:
+				continue  ## every snippet is included once
+			seen.add(name)
+			glsl_lines(strip_glsl_comments(open(os.path.join(shaders_dir, name)).read()), macros, uncertain, seen, out)
+		elif d in ("define", "undef"):
+			name = re.match(r"\w+", arg).group(0)
+			if passing:
+				## unknown from here on, later #ifdef NAME is left to the driver too
+				uncertain.add(name)
+			elif d == "define":
+				value = arg[len(name):].strip()
+				macros[name] = value if value and not value.startswith("(") else "1"
+			else:
+				macros.pop(name, None)
+			out.append(s)
+		else:
+			out.append(ln)
+	if stack:
+		raise SyntaxError("GLSL: unterminated #if")
+	return out
+
+## comments go first so commented out directives are ignored
+def strip_glsl_comments(glsl):
+	glsl = re.sub(r"/\*.*?\*/", " ", glsl, flags=re.S)
+	return re.sub(r"//[^\n]*", "", glsl)
+
+def glsl_tokens(glsl):
+	return [(m.lastgroup, m.group(0)) for m in GLSL_TOKENS.finditer(glsl) if m.lastgroup != "ws"]
+
+def glsl_join(tokens):
+	o = []
+	prev = None
+	for kind, tok in tokens:
+		if kind == "pp":
+			if o and o[-1] != "\n":
+				o.append("\n")
+			o += [tok.strip(), "\n"]
+			prev = None
+			continue
+		if prev:
+			pk, pt = prev
+			if pk in ("id", "num") and kind in ("id", "num"):
+				o.append(" ")
+			elif pt[-1] in "+-/" and tok[0] in "+-*/" and (pt[-1] == tok[0] or pt[-1] == "/"):
+				o.append(" ")
+		o.append(tok)
+		prev = (kind, tok)
+	return "".join(o).strip() + "\n"
+
+def glsl_functions(tokens):
+	## top level function definitions and prototypes: name -> [(start, end)]
+	funcs = {}
+	depth = 0
+	start = 0
+	i = 0
+	while i < len(tokens):
+		kind, tok = tokens[i]
+		if tok == "{":
+			depth += 1
+		elif tok == "}":
+			depth -= 1
+			if depth == 0:
+				start = i + 1
+		elif depth == 0 and (tok == ";" or kind == "pp"):
+			start = i + 1
+		elif (depth == 0 and kind == "id" and i > start and tokens[i - 1][0] == "id" and i + 1 < len(tokens)
+			and tokens[i + 1][1] == "(" and "=" not in [t for k, t in tokens[start:i]]):
+			## <return type> name(...) followed by { or ;
+			j = i + 1
+			paren = 0
+			while j < len(tokens):
+				if tokens[j][1] == "(":
+					paren += 1
+				elif tokens[j][1] == ")":
+					paren -= 1
+					if paren == 0:
+						break
+				j += 1
+			if j + 1 < len(tokens) and tokens[j + 1][1] in ("{", ";"):
+				end = j + 1
+				if tokens[end][1] == "{":
+					braces = 0
+					while end < len(tokens):
+						if tokens[end][1] == "{":
+							braces += 1
+						elif tokens[end][1] == "}":
+							braces -= 1
+							if braces == 0:
+								break
+						end += 1
+				funcs.setdefault(tok, []).append((start, end + 1))
+				i = end
+				start = end + 1
+		i += 1
+	return funcs
+
+def glsl_strip_dead(tokens):
+	funcs = glsl_functions(tokens)
+	if "main" not in funcs:
+		return tokens
+	## function call graph from main, identifiers in directives count as used
+	live = set(["main"])
+	todo = ["main"]
+	for kind, tok in tokens:
+		if kind == "pp":
+			for name in re.findall(r"[A-Za-z_]\w*", tok):
+				if name in funcs and name not in live:
+					live.add(name)
+					todo.append(name)
+	while todo:
+		for start, end in funcs[todo.pop()]:
+			for kind, tok in tokens[start:end]:
+				if tok in funcs and tok not in live:
+					live.add(tok)
+					todo.append(tok)
+	dead = set()
+	for name in funcs:
+		if name not in live:
+			for start, end in funcs[name]:
+				dead.update(range(start, end))
+	tokens = [t for i, t in enumerate(tokens) if i not in dead]
+
+	## single name uniforms nothing refers to
+	counts = {}
+	for kind, tok in tokens:
+		if kind == "id":
+			counts[tok] = counts.get(tok, 0) + 1
+		elif kind == "pp":
+			for name in re.findall(r"[A-Za-z_]\w*", tok):
+				counts[name] = counts.get(name, 0) + 2
+	o = []
+	i = 0
+	while i < len(tokens):
+		if tokens[i][1] == "uniform" and (not o or o[-1][1] in (";", "}") or o[-1][0] == "pp"):
+			j = i
+			while j < len(tokens) and tokens[j][1] not in (";", "{", ",", "["):
+				j += 1
+			## uniform [precision] type name[...];
+			decl = tokens[i:j]
+			end = j
+			while end < len(tokens) and tokens[end][1] not in (";", "{", ","):
+				end += 1
+			if end < len(tokens) and tokens[end][1] == ";" and len(decl) >= 3 and counts.get(decl[-1][1]) == 1:
+				i = end + 1
+				continue
+		o.append(tokens[i])
+		i += 1
+	return o
+
+def glsl_shorten(tokens):
+	funcs = glsl_functions(tokens)
+	structs = set(tokens[i + 1][1] for i in range(len(tokens) - 1) if tokens[i][1] == "struct")
+	keep = set(GLSL_KEYWORDS) | structs
+	inside = set()
+	for name in funcs:
+		for start, end in funcs[name]:
+			inside.update(range(start, end))
+	for i, (kind, tok) in enumerate(tokens):
+		if kind == "pp":
+			keep.update(re.findall(r"[A-Za-z_]\w*", tok))
+		elif kind == "id" and (i not in inside or (i and tokens[i - 1][1] == ".")):
+			## globals (uniforms, in/out, consts, struct members) and member accesses
+			keep.add(tok)
+		elif kind == "id" and tok.startswith("gl_"):
+			keep.add(tok)
+	names = set(n for n in funcs if n != "main")
+	for i, (kind, tok) in enumerate(tokens):
+		if i in inside and (GLSL_TYPES.match(tok) or tok in structs) and i + 1 < len(tokens) and tokens[i + 1][0] == "id":
+			if i + 2 < len(tokens) and tokens[i + 2][1] == "(":
+				continue  ## function definition, handled through funcs
+			names.add(tokens[i + 1][1])
+	names = sorted(n for n in names if n not in keep and not GLSL_TYPES.match(n))
+	used = set(tok for kind, tok in tokens if kind == "id") | keep
+	short = {}
+	gen = ("".join(p) for n in range(1, 4) for p in itertools.product("abcdefghijklmnopqrstuvwxyz", repeat=n))
+	for name in names:
+		new = next(gen)
+		while new in used:
+			new = next(gen)
+		if len(new) < len(name):
+			short[name] = new
+	return [
+		(kind, short.get(tok, tok) if kind == "id" and not (i and tokens[i - 1][1] == ".") else tok)
+		for i, (kind, tok) in enumerate(tokens)
+	]
+
+def preprocess_glsl(f, defines=None, name=None):
 	if f.endswith(".glsl"):
+		name = name or f
 		glsl = open(os.path.join(shaders_dir, f)).read()
 	else:
 		glsl = f
-	o = []
-	for ln in glsl.splitlines():
-		if ln.strip().startswith("//"):
-			continue
-		if "//" in ln:
-			print("WARN: inline comment in GLSL", ln)
-			ln = ln.split("//")[0]
-		o.append(ln.strip())
+	name = name or "inline"
+	debug = "--debug-shaders" in sys.argv
+	shorten = "--glsl-shorten" in sys.argv and not debug
+	defines = defines or {}
+
+	## the variant defines go right after #version, which has to stay the first line
+	raw = len(glsl)
+	lines = strip_glsl_comments(glsl).strip().splitlines()
+	head = [lines.pop(0)] if lines and lines[0].startswith("#version") else []
+	head += ["#define %s %s" % (k, defines[k]) for k in sorted(defines)]
+	src = "\n".join(glsl_lines("\n".join(head + lines), {}, set(), set(), []))
+
+	key = hashlib.sha1(("%s\n%s\n%s\n%s" % (GLSL_PP_VERSION, debug, shorten, src)).encode()).hexdigest()
+	path = os.path.join(CACHE_DIR, "glsl", key + ".glsl")
+	if key in _glsl_memo:
+		out = _glsl_memo[key]
+	elif os.path.isfile(path):
+		out = _glsl_memo[key] = open(path).read()
+	else:
+		if debug:
+			out = "\n".join(ln.rstrip() for ln in src.splitlines() if ln.strip()) + "\n"
+		else:
+			tokens = glsl_strip_dead(glsl_tokens(src))
+			if shorten:
+				tokens = glsl_shorten(tokens)
+			out = glsl_join(tokens)
+		os.makedirs(os.path.dirname(path), exist_ok=True)
+		open(path + ".tmp", "w").write(out)
+		os.replace(path + ".tmp", path)
+		_glsl_memo[key] = out
+	print("glsl: %-28s %6d -> %6d bytes (-%d%%)" % (name, raw, len(out), 100 - 100 * len(out) // max(1, raw)))
+	record_size("glsl %s" % name, out)
+	return out
 
-	return "\\n".join(o)
 
+## @GenMain
+# instanced variant of a vertex shader: the transform uniforms become per-instance
+# attributes (see MeshInstances.h), None if the shader does not declare them
+##
+INSTANCED_ATTRIBS = (
+	(r"uniform\s+mat4\s+transform\s*;", "layout (location = 4) in mat4 transform;"),
+	(r"uniform\s+mat4\s+ntransform\s*;", "layout (location = 8) in mat4 ntransform;"),
+)
 
+def instanced_vshader(vert, defines=None):
+	glsl = preprocess_glsl(vert, defines)
+	glsl, count = re.subn(INSTANCED_ATTRIBS[0][0], INSTANCED_ATTRIBS[0][1], glsl)
+	if not count:
+		return None
+	return re.sub(INSTANCED_ATTRIBS[1][0], INSTANCED_ATTRIBS[1][1], glsl)
 
 
 ## @GenMain
@@ -477,17 +956,512 @@ def get_default_shaders():
 
 
 
+## @GenMain
+# binary assets are linked in as objects by build(), see embed_asset,
+# the generated code only declares the symbols: __netghost_<name>__ and __netghost_<name>_size__
+##
+def asset_symbols(name):
+	return "__netghost_%s__" % name, "__netghost_%s_size__" % name
+
+def asset_decl(name, data, gen_assets):
+	sym, size = asset_symbols(name)
+	if gen_assets is None:
+		## no build stage to link the blob, fallback to a plain array
+		return [
+			'extern "C" const unsigned char %s[] = {%s};' % (sym, ",".join(str(b) for b in data)),
+			'extern "C" const unsigned int %s = %s;' % (size, len(data)),
+		]
+	gen_assets[name] = data
+	return [
+		'extern "C" const unsigned char %s[];' % sym,
+		'extern "C" const unsigned int %s;' % size,
+	]
+
+def asset_string(name):
+	return "std::string((const char *)%s, %s)" % asset_symbols(name)
+
+
+## @GenMain
+# binary scene container written by blender.py --dump (--dump-json keeps the old text dump for debugging):
+# 8 byte magic, uint32 version, uint32 header size, a JSON header padded to SCENE_ALIGN, then the
+# little-endian typed array sections, each aligned to SCENE_ALIGN. the header is the dump without
+# the big arrays, every array is replaced by {"section": i} and "sections" holds their offset,
+# dtype and shape. object pos/rot/scl rows live in the "transforms" section, a header with "delta"
+# is applied on top of the full container it names
+##
+SCENE_MAGIC = b"NGSCENE\0"
+SCENE_VERSION = 1
+SCENE_ALIGN = 16  ## must match blender.py
+SCENE_FORMATS = {"<f4": "f", "<u4": "I"}
+
+## memory maps the file, sections are numpy arrays (or memoryview rows without numpy) over the mapping
+def read_scene_dump(path):
+	if path.endswith(".json"):
+		return json.loads(open(path).read())
+	with open(path, "rb") as f:
+		buf = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+	magic, version, size = struct.unpack_from("<8sII", buf, 0)
+	assert magic == SCENE_MAGIC, "not a netghost scene: %s" % path
+	assert version == SCENE_VERSION, "scene version %s, expected %s: %s" % (version, SCENE_VERSION, path)
+	info = json.loads(bytes(buf[16 : 16 + size]))
+	view = memoryview(buf)
+	sections = []
+	for sec in info.pop("sections"):
+		count = 1
+		for n in sec["shape"]:
+			count *= n
+		if numpy is not None:
+			a = numpy.frombuffer(buf, dtype=sec["dtype"], count=count, offset=sec["offset"]).reshape(sec["shape"])
+		else:
+			nbytes = count * struct.calcsize(SCENE_FORMATS[sec["dtype"]])
+			a = view[sec["offset"] : sec["offset"] + nbytes]
+			if sys.byteorder == "little":
+				a = a.cast(SCENE_FORMATS[sec["dtype"]])
+			else:
+				a = array.array(SCENE_FORMATS[sec["dtype"]], a.tobytes())
+				a.byteswap()
+			if len(sec["shape"]) > 1:
+				w = sec["shape"][1]
+				a = [a[i : i + w] for i in range(0, len(a), w)]
+		sections.append(a)
+	for mesh in info["meshes"].values():
+		for k in mesh:
+			mesh[k] = sections[mesh[k]["section"]]
+	if "transforms" in info:
+		rows = sections[info["transforms"]["section"]]
+		for i, n in enumerate(info.pop("transforms")["objects"]):
+			ob = info["objects"][n]
+			ob["pos"], ob["rot"], ob["scl"] = rows[i][0:3], rows[i][3:6], rows[i][6:9]
+	if "delta" in info:
+		return merge_scene_delta(info)
+	return info
+
+## a delta (blender.py write_scene) carries the object records and meshes that changed since its
+## full base container, the names of removed objects, and the small tables (cameras, lights,
+## shaders, javascript) whole. meshes no longer referenced stay in the base, genmain skips them
+def merge_scene_delta(delta):
+	base = read_scene_dump(delta["delta"]["path"])
+	if base.get("scene_id") != delta["delta"]["base"]:
+		raise RuntimeError("%s was rewritten by another export after this delta was made against it, export the scene again" % delta["delta"]["path"])
+	for n in delta["delta"]["removed"]:
+		del base["objects"][n]
+	base["objects"].update(delta["objects"])
+	base["meshes"].update(delta["meshes"])
+	for k in ("cameras", "lights", "vshaders", "fshaders", "shaders"):
+		base[k] = delta[k]
+	base.pop("javascript", None)
+	if "javascript" in delta:
+		base["javascript"] = delta["javascript"]
+	print("scene delta: %s objects changed, %s removed" % (len(delta["objects"]), len(delta["delta"]["removed"])))
+	return base
+
+
+## @GenMain
+# pack a dumped mesh into GPU ready buffers: interleaved Vertex {pos, normal, uv} floats and GLuint indices,
+# the layout matches struct Vertex in VBO.h so Mesh uploads the blobs without touching them.
+# returns (vbo, ebo, nverts, nindices, index type), meshes go through optimize_mesh when numpy is there
+##
+def pack_mesh(mesh, name=None):
+	if numpy is not None and "--no-mesh-opt" not in sys.argv:
+		return optimize_mesh(mesh, name)
+	verts = mesh["verts"]
+	norms = mesh["normals"]
+	uvs = mesh.get("uvs")
+	if uvs is None or not len(uvs):
+		uvs = [(0.0, 0.0)] * len(verts)
+	vbo = array.array("f")
+	for i in range(len(verts)):
+		vbo.extend(verts[i])
+		vbo.extend(norms[i])
+		vbo.extend(uvs[i])
+	ebo = array.array("I", mesh["indices"])
+	if sys.byteorder != "little":
+		vbo.byteswap()
+		ebo.byteswap()
+	return vbo.tobytes(), ebo.tobytes(), len(verts), len(ebo), "GL_UNSIGNED_INT"
+
+
+## @GenMain
+# offline mesh optimization: weld identical vertices, reorder triangles for the post-transform
+# vertex cache (Tipsify, Sander et al. 2007), reorder vertices by first use for fetch locality and
+# use 16-bit indices when the mesh has less than 65536 vertices. results are cached by content
+##
+MESH_OPT_VERSION = 1
+VERTEX_CACHE_SIZE = 16  ## FIFO size for Tipsify and the ACMR report, small enough for old and mobile GPUs
+
+def vertex_cache_acmr(indices, cache_size=VERTEX_CACHE_SIZE):
+	## average cache miss ratio (transformed vertices per triangle) of a FIFO cache
+	cache = []
+	cached = set()
+	misses = 0
+	for v in indices:
+		if v not in cached:
+			misses += 1
+			cache.append(v)
+			cached.add(v)
+			if len(cache) > cache_size:
+				cached.discard(cache.pop(0))
+	return misses / max(1, len(indices) // 3)
+
+def tipsify(indices, nverts, cache_size=VERTEX_CACHE_SIZE):
+	ntris = len(indices) // 3
+	tris = indices.reshape(-1, 3)
+	## vertex -> triangles adjacency (CSR)
+	corner_vert = indices
+	order = numpy.argsort(corner_vert, kind="stable")
+	adj = (order // 3).tolist()
+	start = numpy.zeros(nverts + 1, dtype=numpy.int64)
+	numpy.cumsum(numpy.bincount(corner_vert, minlength=nverts), out=start[1:])
+	start = start.tolist()
+	live = numpy.bincount(corner_vert, minlength=nverts).tolist()
+	tris = tris.tolist()
+	stamp = [0] * nverts
+	emitted = [False] * ntris
+	dead_end = []
+	out = []
+	clock = cache_size + 1
+	cursor = 0
+
+	def skip_dead_end():
+		nonlocal cursor
+		while dead_end:
+			d = dead_end.pop()
+			if live[d] > 0:
+				return d
+		while cursor < nverts:
+			if live[cursor] > 0:
+				return cursor
+			cursor += 1
+		return -1
+
+	fan = skip_dead_end()
+	while fan >= 0:
+		ring = []
+		for t in adj[start[fan] : start[fan + 1]]:
+			if emitted[t]:
+				continue
+			emitted[t] = True
+			for v in tris[t]:
+				out.append(v)
+				dead_end.append(v)
+				ring.append(v)
+				live[v] -= 1
+				if clock - stamp[v] > cache_size:
+					stamp[v] = clock
+					clock += 1
+		## next fanning vertex: the one that stays in the cache longest while its fan is emitted
+		fan, best = -1, -1
+		for v in ring:
+			if live[v] > 0:
+				age = clock - stamp[v] if clock - stamp[v] + 2 * live[v] <= cache_size else 0
+				if age > best:
+					fan, best = v, age
+		if fan < 0:
+			fan = skip_dead_end()
+	return numpy.array(out, dtype=numpy.uint32)
+
+def mesh_arrays(mesh):
+	verts = numpy.asarray(mesh["verts"], dtype=numpy.float32).reshape(-1, 3)
+	norms = numpy.asarray(mesh["normals"], dtype=numpy.float32).reshape(-1, 3)
+	if mesh.get("uvs") is not None and len(mesh["uvs"]):
+		uvs = numpy.asarray(mesh["uvs"], dtype=numpy.float32).reshape(-1, 2)
+	else:
+		uvs = numpy.zeros((len(verts), 2), dtype=numpy.float32)
+	vbo = numpy.ascontiguousarray(numpy.hstack([verts, norms, uvs]), dtype="<f4")
+	ebo = numpy.asarray(mesh["indices"], dtype="<u4")
+	return vbo, ebo
+
+## bitwise identical {pos, normal, uv} rows become one vertex
+def weld_mesh(vbo, ebo):
+	rows = vbo.view(numpy.dtype((numpy.void, vbo.dtype.itemsize * vbo.shape[1]))).ravel()
+	_, first, remap = numpy.unique(rows, return_index=True, return_inverse=True)
+	return vbo[first], remap.reshape(-1).astype(numpy.uint32)[ebo]
+
+## Tipsify triangle order, then vertices in order of first use (unreferenced ones are dropped)
+def reorder_mesh(vbo, ebo):
+	ebo = tipsify(ebo, len(vbo))
+	used, first_use = numpy.unique(ebo, return_index=True)
+	order = used[numpy.argsort(first_use)]
+	remap = numpy.zeros(len(vbo), dtype=numpy.uint32)
+	remap[order] = numpy.arange(len(order), dtype=numpy.uint32)
+	vbo = vbo[order]
+	ebo = remap[ebo]
+	return vbo, ebo.astype("<u2" if len(vbo) < 0x10000 else "<u4")
+
+def pack_arrays(vbo, ebo):
+	index_type = "GL_UNSIGNED_SHORT" if ebo.dtype.itemsize == 2 else "GL_UNSIGNED_INT"
+	return vbo.astype("<f4").tobytes(), ebo.tobytes(), len(vbo), len(ebo), index_type
+
+def optimize_mesh(mesh, name=None):
+	vbo, ebo = mesh_arrays(mesh)
+	nverts = len(vbo)
+	before = vbo.nbytes + ebo.nbytes
+
+	key = hashlib.sha1(b"%d\n%d\n" % (MESH_OPT_VERSION, VERTEX_CACHE_SIZE) + vbo.tobytes() + ebo.tobytes()).hexdigest()
+	path = os.path.join(CACHE_DIR, "meshes", key + ".npz")
+	if os.path.isfile(path):
+		cached = numpy.load(path)
+		vbo, ebo = cached["vbo"], cached["ebo"]
+		print("mesh: %-28s cached, %d -> %d bytes" % (name or "inline", before, vbo.nbytes + ebo.nbytes))
+	elif len(ebo) and len(vbo):
+		acmr = vertex_cache_acmr(ebo.tolist())
+		vbo, ebo = reorder_mesh(*weld_mesh(vbo, ebo))
+		print("mesh: %-28s verts %d -> %d, ACMR %.3f -> %.3f, %d -> %d bytes (-%d%%)" % (
+			name or "inline", nverts, len(vbo), acmr, vertex_cache_acmr(ebo.tolist()),
+			before, vbo.nbytes + ebo.nbytes, 100 - 100 * (vbo.nbytes + ebo.nbytes) // max(1, before)))
+		os.makedirs(os.path.dirname(path), exist_ok=True)
+		numpy.savez(path + ".tmp.npz", vbo=vbo, ebo=ebo)
+		os.replace(path + ".tmp.npz", path)
+	return pack_arrays(vbo, ebo)
+
+
+## @GenMain
+# LOD chain: quadric error metric edge collapse (Garland & Heckbert 1997) with the collapsed
+# vertex placed on one of the edge ends, so normals and uvs stay valid. open borders get extra
+# constraint planes so silhouettes and uv seams hold, collapses that flip a triangle are refused.
+# every level is simplified from the previous one, cached by mesh hash in $NETGHOST_CACHE/lods
+##
+LOD_VERSION = 1
+MAX_LODS = 4  ## must match NGHOST_MAX_LODS in the generated code
+LOD_HYSTERESIS = 0.1  ## a level switches back only 10% past its threshold
+LOD_BORDER_WEIGHT = 1000.0
+
+def quadric_error(q, x, y, z):
+	return (
+		q[0] * x * x + 2 * q[1] * x * y + 2 * q[2] * x * z + 2 * q[3] * x
+		+ q[4] * y * y + 2 * q[5] * y * z + 2 * q[6] * y
+		+ q[7] * z * z + 2 * q[8] * z + q[9]
+	)
+
+## symmetric 4x4 plane quadrics as 10 coefficients: 00 01 02 03 11 12 13 22 23 33
+def plane_quadrics(planes, weights):
+	rows, cols = [0, 0, 0, 0, 1, 1, 1, 2, 2, 3], [0, 1, 2, 3, 1, 2, 3, 2, 3, 3]
+	return planes[:, rows] * planes[:, cols] * weights[:, None]
+
+def vertex_quadrics(pos, tris):
+	p0, p1, p2 = pos[tris[:, 0]], pos[tris[:, 1]], pos[tris[:, 2]]
+	normal = numpy.cross(p1 - p0, p2 - p0)
+	area = numpy.linalg.norm(normal, axis=1)
+	ok = area > 1e-12
+	normal[ok] /= area[ok, None]
+	planes = numpy.hstack([normal, -(normal * p0).sum(axis=1)[:, None]])
+	q = numpy.zeros((len(pos), 10))
+	k = plane_quadrics(planes, area * 0.5)
+	for c in range(3):
+		numpy.add.at(q, tris[:, c], k)
+	## border edges (used by one triangle) get a plane through the edge, perpendicular to the face
+	edges = numpy.sort(tris[:, [0, 1, 1, 2, 2, 0]].reshape(-1, 2), axis=1)
+	_, inverse, counts = numpy.unique(edges, axis=0, return_inverse=True, return_counts=True)
+	border = counts[inverse.reshape(-1)] == 1
+	if border.any():
+		face = numpy.repeat(numpy.arange(len(tris)), 3)[border]
+		a, b = edges[border, 0], edges[border, 1]
+		along = pos[b] - pos[a]
+		side = numpy.cross(along, normal[face])
+		length = numpy.linalg.norm(side, axis=1)
+		ok = length > 1e-12
+		side[ok] /= length[ok, None]
+		side_planes = numpy.hstack([side, -(side * pos[a]).sum(axis=1)[:, None]])
+		k = plane_quadrics(side_planes, (along ** 2).sum(axis=1) * LOD_BORDER_WEIGHT)
+		numpy.add.at(q, a, k)
+		numpy.add.at(q, b, k)
+	return q
+
+def qem_simplify(pos, ebo, target):
+	pos = numpy.asarray(pos, dtype=numpy.float64)
+	tris = ebo.reshape(-1, 3).astype(numpy.int64)
+	quadrics = vertex_quadrics(pos, tris).tolist()
+	pos = pos.tolist()
+	faces = tris.tolist()
+	vert_faces = [set() for _ in pos]
+	for f, t in enumerate(faces):
+		for v in t:
+			vert_faces[v].add(f)
+	alive = len(faces)
+	removed = [False] * len(pos)
+	version = [0] * len(pos)
+
+	def collapse_cost(a, b):
+		q = [quadrics[a][i] + quadrics[b][i] for i in range(10)]
+		ea = quadric_error(q, *pos[a])
+		eb = quadric_error(q, *pos[b])
+		return (ea, b, a) if ea <= eb else (eb, a, b)  ## (error, dropped, kept)
+
+	def normal(t, moved=None, to=None):
+		p0, p1, p2 = [pos[to] if v == moved else pos[v] for v in t]
+		u = [p1[i] - p0[i] for i in range(3)]
+		w = [p2[i] - p0[i] for i in range(3)]
+		return (u[1] * w[2] - u[2] * w[1], u[2] * w[0] - u[0] * w[2], u[0] * w[1] - u[1] * w[0])
+
+	heap = []
+	def entry(a, b):
+		cost, drop, keep = collapse_cost(a, b)
+		return (cost, drop, keep, version[drop], version[keep])
+
+	seen = set()
+	for t in faces:
+		for a, b in ((t[0], t[1]), (t[1], t[2]), (t[2], t[0])):
+			if (min(a, b), max(a, b)) not in seen:
+				seen.add((min(a, b), max(a, b)))
+				heap.append(entry(a, b))
+	heapq.heapify(heap)
+
+	while alive > target and heap:
+		cost, drop, keep, vd, vk = heapq.heappop(heap)
+		if removed[drop] or removed[keep] or version[drop] != vd or version[keep] != vk:
+			continue
+		if not any(keep in faces[f] for f in vert_faces[drop]):
+			continue
+		flips = False
+		for f in vert_faces[drop]:
+			if keep in faces[f]:
+				continue
+			n0 = normal(faces[f])
+			n1 = normal(faces[f], drop, keep)
+			if n0[0] * n1[0] + n0[1] * n1[1] + n0[2] * n1[2] <= 0:
+				flips = True
+				break
+		if flips:
+			continue
+		for f in list(vert_faces[drop]):
+			t = faces[f]
+			if keep in t:
+				for v in t:
+					vert_faces[v].discard(f)
+				faces[f] = None
+				alive -= 1
+			else:
+				t[t.index(drop)] = keep
+				vert_faces[keep].add(f)
+		vert_faces[drop] = set()
+		removed[drop] = True
+		quadrics[keep] = [quadrics[keep][i] + quadrics[drop][i] for i in range(10)]
+		version[keep] += 1
+		for v in set(v for f in vert_faces[keep] for v in faces[f]) - {keep}:
+			heapq.heappush(heap, entry(keep, v))
+	return numpy.array([v for t in faces if t for v in t], dtype=numpy.uint32)
+
+## packed buffers of LOD 1..count-1 (LOD 0 is pack_mesh), each level keeps `ratio` of the triangles
+def lod_chain(mesh, name, count, ratio):
+	count = min(count, MAX_LODS)
+	if count < 2:
+		return []
+	if numpy is None:
+		print("lod: numpy is not installed, %s is exported without LODs" % name)
+		return []
+	vbo, ebo = mesh_arrays(mesh)
+	## every level goes through reorder_mesh, so its version and cache size are part of the key
+	key = hashlib.sha1(
+		b"%d\n%d\n%d\n%d\n%r\n" % (LOD_VERSION, MESH_OPT_VERSION, VERTEX_CACHE_SIZE, count, ratio) + vbo.tobytes() + ebo.tobytes()
+	).hexdigest()
+	path = os.path.join(CACHE_DIR, "lods", key + ".npz")
+	if os.path.isfile(path):
+		cached = numpy.load(path)
+		levels = [(cached["vbo%s" % i], cached["ebo%s" % i]) for i in range(1, count)]
+		print("lod: %-28s cached, %s levels" % (name, count))
+	else:
+		vbo, ebo = weld_mesh(vbo, ebo)
+		levels = []
+		tris = ebo
+		for i in range(1, count):
+			target = max(4, int(len(ebo) // 3 * ratio ** i))
+			with stage("lod %s %s" % (name, i), "lod"):
+				tris = qem_simplify(vbo[:, :3], tris, target)
+				levels.append(reorder_mesh(vbo, tris))
+			print("lod: %-28s level %s, %d -> %d triangles" % (name, i, len(ebo) // 3, len(tris) // 3))
+		os.makedirs(os.path.dirname(path), exist_ok=True)
+		arrays = {}
+		for i, (v, e) in enumerate(levels):
+			arrays["vbo%s" % (i + 1)] = v
+			arrays["ebo%s" % (i + 1)] = e
+		numpy.savez(path + ".tmp.npz", **arrays)
+		os.replace(path + ".tmp.npz", path)
+	return [pack_arrays(v, e) for v, e in levels]
+
+
+## @GenMain
+# world space AABB of an object, dumps from blender.py carry it already ("aabb"), older json
+# scenes get it from the local mesh bounds and pos/rot/scl (euler XYZ like glm::quat(vec3))
+##
+def local_bounds(verts):
+	if not len(verts):
+		return [[0.0] * 3, [0.0] * 3]
+	if numpy is not None and isinstance(verts, numpy.ndarray):
+		return [verts.min(axis=0).tolist(), verts.max(axis=0).tolist()]
+	return [[min(v[a] for v in verts) for a in range(3)], [max(v[a] for v in verts) for a in range(3)]]
+
+def euler_matrix(rot):
+	cx, cy, cz = [math.cos(r) for r in rot]
+	sx, sy, sz = [math.sin(r) for r in rot]
+	## Rz * Ry * Rx
+	return [
+		[cy * cz, sx * sy * cz - cx * sz, cx * sy * cz + sx * sz],
+		[cy * sz, sx * sy * sz + cx * cz, cx * sy * sz - sx * cz],
+		[-sy, sx * cy, cx * cy],
+	]
+
+def object_bounds(ob, local):
+	if "aabb" in ob:
+		return ob["aabb"]
+	r = euler_matrix(ob.get("rot", (0, 0, 0)))
+	scl = ob.get("scl", (1, 1, 1))
+	pos = ob.get("pos", (0, 0, 0))
+	center = [(local[0][a] + local[1][a]) * 0.5 * scl[a] for a in range(3)]
+	extent = [(local[1][a] - local[0][a]) * 0.5 * abs(scl[a]) for a in range(3)]
+	lo, hi = [], []
+	for a in range(3):
+		c = pos[a] + sum(r[a][b] * center[b] for b in range(3))
+		e = sum(abs(r[a][b]) * extent[b] for b in range(3))
+		lo.append(c - e)
+		hi.append(c + e)
+	return [lo, hi]
+
+
+## @GenMain
+# static bounding volume hierarchy over world AABBs, median split on the longest centroid axis.
+# nodes are [min, max, first, count, skip] in depth first order (see BVHNode in Frustum.h),
+# items is the leaf ordered list of box indices
+##
+def build_bvh(boxes):
+	nodes = []
+	items = []
+	def centroid(i, a):
+		return boxes[i][0][a] + boxes[i][1][a]
+	def add(idx):
+		n = len(nodes)
+		nodes.append([
+			[min(boxes[i][0][a] for i in idx) for a in range(3)],
+			[max(boxes[i][1][a] for i in idx) for a in range(3)],
+			len(items), len(idx), 0,
+		])
+		if len(idx) == 1:
+			items.append(idx[0])
+		else:
+			axis = max(range(3), key=lambda a: max(centroid(i, a) for i in idx) - min(centroid(i, a) for i in idx))
+			idx = sorted(idx, key=lambda i: centroid(i, axis))
+			add(idx[: len(idx) // 2])
+			add(idx[len(idx) // 2 :])
+		nodes[n][4] = len(nodes)
+	if boxes:
+		add(list(range(len(boxes))))
+	assert len(nodes) < 0xFFFF
+	return nodes, items
+
+
 ## @GenMain
 # Generate a new main scene with blender bindings
 ##
-def genmain( gen_ctypes=None, gen_js=None, basis_universal=True ):
+def genmain( gen_ctypes=None, gen_js=None, gen_assets=None, basis_universal=True ):
 	o = [
 		"#define GLEW_STATIC",
 		"#include <GL/glew.h>",
 		"#include <GLFW/glfw3.h>",
 		'#include "Scene.h"',
+		'#include "MeshInstances.h"',
+		'#include "Frustum.h"',
+		'#include "Profiler.h"',
+		'#include <cstring>',
 		#'#include "VBO.h"',
-		"struct __vertex__{float x; float y; float z;};",
 	]
 	if basis_universal:
 		o += [
@@ -502,6 +1476,10 @@ def genmain( gen_ctypes=None, gen_js=None, basis_universal=True ):
 		]
 	else:
 		o.append('#define EMSCRIPTEN_KEEPALIVE')
+		o += [
+			"#include <thread>",
+			"#include <chrono>",
+		]
 
 	o += [
 		NGHOST_DERIVED_SCENE,
@@ -514,21 +1492,38 @@ def genmain( gen_ctypes=None, gen_js=None, basis_universal=True ):
 
 	if gen_ctypes is not None:
 		gen_ctypes['netghost_window_init'] = [ctypes.c_int, ctypes.c_int]
+		gen_ctypes['netghost_set_loop_mode'] = [ctypes.c_int]
+		gen_ctypes['netghost_set_tick_rate'] = [ctypes.c_double]
+		gen_ctypes['netghost_set_frame_cap'] = [ctypes.c_double]
+		gen_ctypes['netghost_set_render_divisor'] = [ctypes.c_uint]
+		gen_ctypes['netghost_get_frame_stats'] = []
+		gen_ctypes['netghost_get_frame_count'] = []
+		gen_ctypes['netghost_get_profile_phase'] = [ctypes.c_uint]
 	if gen_js is not None:
 		gen_js['netghost_window_init'] = 'function (x,y) {Module.ccall("netghost_window_init", "number", ["number", "number"], [x,y]);}'
+		gen_js['netghost_set_loop_mode'] = 'function (m) {Module.ccall("netghost_set_loop_mode", null, ["number"], [m]);}'
+		gen_js['netghost_set_tick_rate'] = 'function (hz) {Module.ccall("netghost_set_tick_rate", null, ["number"], [hz]);}'
+		gen_js['netghost_set_render_divisor'] = 'function (n) {Module.ccall("netghost_set_render_divisor", null, ["number"], [n]);}'
+		## {phase: {cpu: [ms per frame], gpu: [...]}} oldest frame first
+		gen_js['netghost_get_frame_stats'] = ('function () {'
+			'var p = Module.ccall("netghost_get_frame_stats", "number", [], []) >> 2;'
+			'var frames = Module.ccall("netghost_get_frame_count", "number", [], []);'
+			'var stats = {}, phases = [], name;'
+			'while ((name = Module.ccall("netghost_get_profile_phase", "string", ["number"], [phases.length]))) phases.push(name);'
+			'phases.forEach(function (n, i) {stats[n] = {cpu: [], gpu: []};'
+			'for (var f = 0; f < frames; f++) {'
+			'stats[n].cpu.push(HEAPF32[p + f * 2 * phases.length + i]);'
+			'stats[n].gpu.push(HEAPF32[p + (f * 2 + 1) * phases.length + i]);}});'
+			'return stats;}')
 		gen_js['netghost_init_meshes'] = 'function () {Module.ccall("netghost_init_meshes", "number", [], []);}'
 
 	font = None
 	blends = []
 	shaders = {}
 	for arg in sys.argv:
-		if arg.endswith((".blend", ".json")):
+		## scenes are loaded once, in the loop below
+		if arg.endswith((".blend", ".json", ".ngs")):
 			blends.append(arg)
-		if arg.endswith(".json"):
-			## check if there are any shaders
-			info = json.loads(open(arg).read())
-			if info["shaders"]:
-				shaders.update(info["shaders"])
 		if arg.endswith(".ttf"):
 			font = open(arg, "rb").read()
 
@@ -538,10 +1533,7 @@ def genmain( gen_ctypes=None, gen_js=None, basis_universal=True ):
 		print("using default font:", defont)
 		font = open(defont, "rb").read()
 
-	o += [
-		"unsigned char __netghost_font__[] = {%s};" % ",".join(str(b) for b in font),
-		"unsigned int   __netghost_font_size__ = %s;" % len(font),
-	]
+	o += asset_decl("font", font, gen_assets)
 
 	helper_funcs = []
 
@@ -554,13 +1546,23 @@ def genmain( gen_ctypes=None, gen_js=None, basis_universal=True ):
 		"	unsigned int entID;",
 	]
 
+	## drops the entities of this module when a newer scene module is loaded
+	clear_meshes = [
+		'EMSCRIPTEN_KEEPALIVE',
+		'extern "C" void netghost_clear_meshes(){',
+	]
+
 	# [todo]
 	draw_loop = [
 		'EMSCRIPTEN_KEEPALIVE',
 		'extern "C" void netghost_redraw(){',
-		"	//",
-		"	//",
+		"	Globals::get().drawCalls = 0;",
+		"	Globals::get().stateChanges = 0;",
+		"	VAO::ResetStateCount();",
+		"	netghost_cull();",
 	]
+	## scripts run after the sorted draw queue, in object order
+	script_loop = []
 
 	init_cameras = [
 		'EMSCRIPTEN_KEEPALIVE',
@@ -575,21 +1577,24 @@ def genmain( gen_ctypes=None, gen_js=None, basis_universal=True ):
 	]
 
 	user_js = []
+	objects = {}
+	unique_meshes = {}
+	packed_meshes = {}
+	mesh_bounds = {}
+	lod_keys = {}
+	queue = []
 
 	if not blends:
 		## exports just the default Cube
 		blends.append(None)
 	for blend in blends:
-		if blend and blend.endswith(".json"):
-			info = json.loads(open(blend).read())
+		if blend and blend.endswith((".json", ".ngs")):
+			with stage("load %s" % blend, "load"):
+				info = read_scene_dump(blend)
 		else:
-			cmd = [BLENDER]
-			if blend:
-				cmd.append(blend)
-			cmd += ["--background", "--python", "./blender.py", "--", "--dump"]
-			print(cmd)
-			subprocess.check_call(cmd)
-			info = json.loads(open("/tmp/dump.json").read())
+			with stage("blender dump %s" % (blend or "default cube"), "blender"):
+				dump = blender_dump(blend, "--dump-json" in sys.argv)
+			info = read_scene_dump(dump)
 
 		shaders.update(info['shaders'])
 		if 'javascript' in info and info['javascript']:
@@ -625,137 +1630,402 @@ def genmain( gen_ctypes=None, gen_js=None, basis_universal=True ):
 			]
 
 		meshes = info["objects"]
-		allprops = {}
-		for n in meshes:
-			if "props" in meshes[n]:
-				for k in meshes[n]["props"]:
-					if k not in allprops:
-						allprops[k] = 1
-						draw_loop.append("float %s;" % k)
-
 		for n in meshes:
 			print(meshes[n])
+			## linked duplicates point at one entry of info["meshes"], identical data is
+			## merged again by content so every mesh is packed and uploaded once
+			if "mesh" in meshes[n]:
+				data = info["meshes"][meshes[n]["mesh"]]
+				if (blend, meshes[n]["mesh"]) not in packed_meshes:
+					packed_meshes[(blend, meshes[n]["mesh"])] = pack_mesh(data, meshes[n]["mesh"])
+				packed = packed_meshes[(blend, meshes[n]["mesh"])]
+			else:
+				data = meshes[n]
+				packed = pack_mesh(data, n)
+			key = hashlib.sha1(packed[0] + packed[1]).hexdigest()[:12]
+			unique_meshes.setdefault(key, packed)
+			if key not in mesh_bounds:
+				mesh_bounds[key] = local_bounds(data["verts"])
+			objects[n] = (meshes[n], key)
+
+			lod = meshes[n].get("lod")
+			if lod and lod["count"] > 1 and "--no-lod" not in sys.argv:
+				mname = meshes[n].get("mesh", n)
+				chain = (blend, mname, lod["count"], lod.get("ratio", 0.5))
+				if chain not in packed_meshes:
+					packed_meshes[chain] = lod_chain(data, mname, chain[2], chain[3])
+				lod_keys[n] = [key]
+				for level in packed_meshes[chain]:
+					lkey = hashlib.sha1(level[0] + level[1]).hexdigest()[:12]
+					unique_meshes.setdefault(lkey, level)
+					mesh_bounds.setdefault(lkey, mesh_bounds[key])
+					lod_keys[n].append(lkey)
+
+	## only the programs the objects draw with are embedded, plus text and wire (the engine
+	## needs those two), anything the scene does not define comes from ./Resources/shaders/*.glsl
+	used = set(objects[n][0].get("shader", "wire") for n in objects) | {"text", "wire"}
+	defaults = get_default_shaders()
+	for tag in used:
+		if tag not in shaders and tag in defaults:
+			shaders[tag] = defaults[tag]
+	for tag in list(shaders):
+		if tag not in used:
+			print("skipping unused shader:", tag)
+			del shaders[tag]
+
+	## objects without scripts that share a mesh and shader are drawn with one instanced draw.
+	## every object stays an entity sharing one Model per mesh, so the copies keep their
+	## __ID__, shadows, stencil highlight and wireframe, their color pass is the instanced draw
+	groups = {}
+	for n in objects:
+		ob, key = objects[n]
+		sname = ob.get("shader", "wire")
+		if ob.get("scripts") or n in lod_keys or sname not in shaders or "vert" not in shaders[sname]:
+			continue
+		if instanced_vshader(shaders[sname]["vert"], shaders[sname].get("defines")):
+			groups.setdefault((key, sname), []).append(n)
+	groups = {g: groups[g] for g in groups if len(groups[g]) > 1}
+	instanced = {n: i for i, g in enumerate(groups) for n in groups[g]}
+	instanced_shaders = set(sname for key, sname in groups)
+
+	## frustum culling items: every entity, then every instanced group as a whole,
+	## scripted objects move so they are never culled (same for objects moved with set_*_pos/rot)
+	entities = [n for n in objects if n not in instanced]
+	cull_item = {n: i for i, n in enumerate(entities)}
+	for n in instanced:
+		cull_item[n] = len(entities) + instanced[n]
+	boxes = [object_bounds(objects[n][0], mesh_bounds[objects[n][1]]) for n in entities]
+	for g in groups:
+		members = [object_bounds(objects[n][0], mesh_bounds[objects[n][1]]) for n in groups[g]]
+		boxes.append([[min(b[0][a] for b in members) for a in range(3)], [max(b[1][a] for b in members) for a in range(3)]])
+	bvh, bvh_items = build_bvh(boxes)
+	weights = [1] * len(entities) + [len(groups[g]) for g in groups]
+	dynamic = [1 if objects[n][0].get("scripts") else 0 for n in entities] + [0] * len(groups)
+	print("culling %s items, %s BVH nodes" % (len(boxes), len(bvh)))
+
+	for key in unique_meshes:
+		vbo, ebo, nverts, nindices, index_type = unique_meshes[key]
+		o.append("Mesh *mesh_%s;" % key)
+		o.append("Model *model_%s = nullptr;" % key)
+		o += asset_decl("mesh_%s_vbo" % key, vbo, gen_assets)
+		o += asset_decl("mesh_%s_ebo" % key, ebo, gen_assets)
+		init_meshes += [
+			## single upload straight from the linked blobs
+			"	mesh_%s = new Mesh(%s, %s, %s, %s, %s);" % (
+				key, asset_symbols("mesh_%s_vbo" % key)[0], nverts,
+				asset_symbols("mesh_%s_ebo" % key)[0], nindices, index_type),
+		]
 
-			verts = ["{%sf,%sf,%sf}" % tuple(vec) for vec in meshes[n]["verts"]]
-			norms = ["{%sf,%sf,%sf}" % tuple(vec) for vec in meshes[n]["normals"]]
-
-			o.append("Mesh *mesh_%s;" % n)
-			o.append("Transform *transform_%s;" % n)
-			o.append(
-				"static const __vertex__ _arr_%s[%s] = {%s};"
-				% (n, len(verts), ",".join(verts))
-			)
-			o.append(
-				"static const __vertex__ _narr_%s[%s] = {%s};"
-				% (n, len(norms), ",".join(norms))
-			)
-			o.append("unsigned short __ID__%s;" % n)
-
-			if "props" in meshes[n]:
-				for k in meshes[n]["props"]:
-					val = meshes[n]["props"][k]
-					o.append("float %s_prop_%s = %s;" % (n, k, val))
-
-			helper_funcs += [
-				'EMSCRIPTEN_KEEPALIVE',
-				'extern "C" void set_%s_pos(float x, float y, float z){' % n,
-				'   transform_%s->setTranslation(glm::vec3(x, y, z));' % n,
-				'}',
-				'EMSCRIPTEN_KEEPALIVE',
-				'extern "C" void set_%s_rot(float x, float y, float z){' % n,
-				'   transform_%s->setRotation(glm::vec3(x, y, z));' % n,
-				'}',
-			]
-			if gen_ctypes is not None:
-				gen_ctypes['set_%s_pos' % n] = [ctypes.c_float, ctypes.c_float, ctypes.c_float]
-				gen_ctypes['set_%s_rot' % n] = [ctypes.c_float, ctypes.c_float, ctypes.c_float]
-
-			if gen_js is not None:
-				gen_js['set_%s_pos' % n] = 'function (x,y,z){Module.ccall("set_%s_pos","number", ["number","number","number"],[x,y,z]);}' % n
-				gen_js['set_%s_rot' % n] = 'function (x,y,z){Module.ccall("set_%s_rot","number", ["number","number","number"],[x,y,z]);}' % n
+	for i, (key, sname) in enumerate(groups):
+		print("instancing %s copies of mesh %s with shader %s" % (len(groups[(key, sname)]), key, sname))
+		o.append("MeshInstances *instances_%s;" % i)
+		init_meshes.append("	instances_%s = new MeshInstances(mesh_%s);" % (i, key))
+		clear_meshes.append("	delete instances_%s;" % i)
+
+	## every level of a LOD chain gets its Model up front, the scene holds one reference on each
+	## so switching levels never drops a Model to zero users
+	lod_models = sorted(set(k for n in lod_keys for k in lod_keys[n]))
+	for key in lod_models:
+		init_meshes += [
+			"	model_%s = new Model();" % key,
+			"	model_%s->meshes.push_back(*mesh_%s);" % (key, key),
+			"	model_%s->users++;" % key,
+		]
 
-			draw_loop += [
-				'	std::cout << "drawing: %s" << std::endl;' % n,
-				"	ECS::get().DrawEntity(__ID__%s);" % n,
-			]
-			if "scripts" in meshes[n] and meshes[n]["scripts"]:
-				draw_loop.append("	self = ECS::get().getEntity(__ID__%s);" % n)
+	## custom props are stored as one contiguous column per property, indexed by the
+	## object index (order of objects), scripts get references into the columns
+	names = list(objects)
+	props = {}
+	for i, n in enumerate(names):
+		for k in objects[n][0].get("props", {}):
+			if k not in props:
+				props[k] = [0.0] * len(names)
+			props[k][i] = objects[n][0]["props"][k]
+	o.append("#define NGHOST_OBJECTS %s" % len(names))
+	o.append("const char *__object_names__[%s] = {%s};" % (max(1, len(names)), ", ".join('"%s"' % n for n in names)))
+	for k in props:
+		o.append("float __prop_%s__[NGHOST_OBJECTS] = {%s};" % (k, ", ".join("%sf" % v for v in props[k])))
+
+	helper_funcs += [
+		'EMSCRIPTEN_KEEPALIVE',
+		'extern "C" unsigned int netghost_get_object_count(){',
+		'	return NGHOST_OBJECTS;',
+		'}',
+		'EMSCRIPTEN_KEEPALIVE',
+		'extern "C" const char *netghost_get_object_name(unsigned int i){',
+		'	return i < NGHOST_OBJECTS ? __object_names__[i] : nullptr;',
+		'}',
+		## the whole column can be read or written through the returned pointer
+		'EMSCRIPTEN_KEEPALIVE',
+		'extern "C" float *netghost_get_prop_column(const char *name){',
+	]
+	for k in props:
+		helper_funcs.append('	if (strcmp(name, "%s") == 0) return __prop_%s__;' % (k, k))
+	helper_funcs += [
+		'	return nullptr;',
+		'}',
+	]
+	if gen_ctypes is not None:
+		gen_ctypes['netghost_get_object_count'] = []
+		gen_ctypes['netghost_get_object_name'] = [ctypes.c_uint]
+		gen_ctypes['netghost_get_prop_column'] = [ctypes.c_char_p]
+	if gen_js is not None:
+		gen_js['netghost_get_object_count'] = 'function () {return Module.ccall("netghost_get_object_count", "number", [], []);}'
+		gen_js['netghost_get_object_name'] = 'function (i) {return Module.ccall("netghost_get_object_name", "string", ["number"], [i]);}'
+		## a Float32Array view on the wasm heap, one value per object
+		gen_js['netghost_get_prop_column'] = 'function (name) {var p = Module.ccall("netghost_get_prop_column", "number", ["string"], [name]); return p ? HEAPF32.subarray(p >> 2, (p >> 2) + ghostapi.netghost_get_object_count()) : null;}'
+
+	for n in objects:
+		ob, key = objects[n]
+		o.append("Transform *transform_%s;" % n)
+
+		helper_funcs += [
+			'EMSCRIPTEN_KEEPALIVE',
+			'extern "C" void set_%s_pos(float x, float y, float z){' % n,
+			'   transform_%s->setTranslation(glm::vec3(x, y, z));' % n,
+			'   __cull_dynamic__[%s] = 1;' % cull_item[n],
+			'}',
+			'EMSCRIPTEN_KEEPALIVE',
+			'extern "C" void set_%s_rot(float x, float y, float z){' % n,
+			'   transform_%s->setRotation(glm::vec3(x, y, z));' % n,
+			'   __cull_dynamic__[%s] = 1;' % cull_item[n],
+			'}',
+		]
+		if gen_ctypes is not None:
+			gen_ctypes['set_%s_pos' % n] = [ctypes.c_float, ctypes.c_float, ctypes.c_float]
+			gen_ctypes['set_%s_rot' % n] = [ctypes.c_float, ctypes.c_float, ctypes.c_float]
 
-				if "props" in meshes[n]:
-					for k in meshes[n]["props"]:
-						## gets global and sets to local
-						draw_loop.append("%s = %s_prop_%s;" % (k, n, k))
+		if gen_js is not None:
+			gen_js['set_%s_pos' % n] = 'function (x,y,z){Module.ccall("set_%s_pos","number", ["number","number","number"],[x,y,z]);}' % n
+			gen_js['set_%s_rot' % n] = 'function (x,y,z){Module.ccall("set_%s_rot","number", ["number","number","number"],[x,y,z]);}' % n
 
-				## TODO check if any of the scripts actually use transform->
-				## and only generate this if required
-				draw_loop.append('transform = transform_%s;' % n)
+		init_meshes += [
+			"	transform_%s = new Transform();" % n,
+			"	trf = transform_%s;" % n,
+			"	trf->setTranslation(glm::vec3(%sf, %sf, %sf));" % tuple(ob["pos"]),
+			"	trf->setScale(glm::vec3(%sf, %sf, %sf));" % tuple(ob["scl"]),
 
+			"	trf->setRotation(glm::vec3(%sf, %sf, %sf));" % tuple(ob["rot"]),
+		]
+		if n in instanced:
+			init_meshes.append("	instances_%s->add(trf);" % instanced[n])
+
+		o.append("unsigned short __ID__%s;" % n)
+		clear_meshes.append("	ECS::get().deleteEntity(__ID__%s);" % n)
+
+		queue.append((ob.get("shader", "wire"), key, ob.get("material", ""), n))
+		if "scripts" in ob and ob["scripts"]:
+			## each script block gets its own handles: the entity, its transform and
+			## references into the prop columns (no copy in/out)
+			script_loop += [
+				"	{",
+				"	Entity self = ECS::get().getEntity(__ID__%s);" % n,
+				"	Transform *transform = transform_%s;" % n,
+			]
+			for k in ob.get("props", {}):
+				script_loop.append("	float &%s = __prop_%s__[%s];" % (k, k, names.index(n)))
+
+			for cpp in ob["scripts"]:
+				script_loop.append(cpp)
+			script_loop.append("	}")
+
+		init_meshes += [
+			## entities of the same mesh share one Model, the ECS counts its users
+			"	if (!model_%s) {" % key,
+			"		model_%s = new Model();" % key,
+			"		model_%s->meshes.push_back(*mesh_%s);" % (key, key),
+			"	}",
+			"	mdl = model_%s;" % key,
+			'	std::cout << "mesh init: %s" << std::endl;' % n,
+			"	entID = ECS::get().createEntity();",
+			"	__ID__%s = (unsigned short)entID;" % n,
+		]
+		if n in instanced:
+			init_meshes += [
+				"	{ Entity e = ECS::get().getEntity(entID); e.instanced_flag = 1; ECS::get().updateEntity(e); }",
+			]
+		else:
+			init_meshes.append("	__cull_ids__[%s] = __ID__%s;" % (cull_item[n], n))
+		init_meshes += [
+			"	ECS::get().addModel(entID, mdl);",
+			"	ECS::get().addCamera(entID, Globals::get().camera);",
+			"	ECS::get().addTransform(entID, trf);",
+			"	ECS::get().addWireFrame(entID, 3.0f, 4.0f, 6.0f);",
+		]
+		if "shader" in ob:
+			sname = ob["shader"]
+			init_meshes.append("ECS::get().addShader(entID, *shader_%s);" % sname)
+		else:
+			init_meshes.append("ECS::get().addShader(entID, *shader_wire);")
 
-				for cpp in meshes[n]["scripts"]:
-					draw_loop.append(cpp)
+	for key in lod_models:
+		clear_meshes.append("	if (--model_%s->users == 0) delete model_%s;" % (key, key))
 
-				if "props" in meshes[n]:
-					for k in meshes[n]["props"]:
-						## sets global to local
-						draw_loop.append("%s_prop_%s = %s;" % (n, k, k))
+	## LOD selection from the projected size of the bounding sphere, with hysteresis
+	lods = [n for n in objects if n in lod_keys]
+	o += [
+		"#define NGHOST_MAX_LODS %s" % MAX_LODS,
+		"#define NGHOST_LOD_HYSTERESIS %sf" % LOD_HYSTERESIS,
+		"struct NGLod {",
+		"	unsigned short id;",
+		"	unsigned char count;",
+		"	unsigned char level;",
+		"	float radius;",
+		"	float screen[NGHOST_MAX_LODS - 1];",
+		"	Model *models[NGHOST_MAX_LODS];",
+		"	Transform *transform;",
+		"};",
+		"NGLod __lods__[%s];" % max(1, len(lods)),
+	]
+	for i, n in enumerate(lods):
+		ob, key = objects[n]
+		if "sphere" in ob:
+			radius = ob["sphere"][1]
+		else:
+			lo, hi = object_bounds(ob, mesh_bounds[key])
+			radius = math.sqrt(sum((hi[a] - lo[a]) ** 2 for a in range(3))) * 0.5
+		screen = (list(ob["lod"].get("screen", [])) + [0.0] * MAX_LODS)[: MAX_LODS - 1]
+		init_meshes += [
+			"	__lods__[%s].id = __ID__%s;" % (i, n),
+			"	__lods__[%s].count = %s;" % (i, len(lod_keys[n])),
+			"	__lods__[%s].level = 0;" % i,
+			"	__lods__[%s].radius = %sf;" % (i, radius),
+			"	__lods__[%s].transform = transform_%s;" % (i, n),
+		]
+		for level, v in enumerate(screen):
+			init_meshes.append("	__lods__[%s].screen[%s] = %sf;" % (i, level, v))
+		for level, lkey in enumerate(lod_keys[n]):
+			init_meshes.append("	__lods__[%s].models[%s] = model_%s;" % (i, level, lkey))
+	helper_funcs += [
+		'EMSCRIPTEN_KEEPALIVE',
+		'extern "C" void netghost_select_lods(){',
+	]
+	if lods:
+		helper_funcs += [
+			'	Camera *cam = Globals::get().camera;',
+			'	float k = 1.0f / tanf(glm::radians(cam->getFOV()) * 0.5f);',
+			'	for (unsigned int i = 0; i < %s; i++) {' % len(lods),
+			'		NGLod &lod = __lods__[i];',
+			'		float d = glm::length(lod.transform->getTranslation() - cam->getPosition());',
+			'		float size = d > lod.radius ? lod.radius * k / d : 1.0f;',
+			'		unsigned char level = lod.level;',
+			'		while (level + 1 < lod.count && size < lod.screen[level] * (1.0f - NGHOST_LOD_HYSTERESIS)) level++;',
+			'		while (level > 0 && size > lod.screen[level - 1] * (1.0f + NGHOST_LOD_HYSTERESIS)) level--;',
+			'		if (level != lod.level) {',
+			'			Model *&mdl = ECS::get().cset_model.getMem(lod.id);',
+			'			mdl->users--;',
+			'			mdl = lod.models[level];',
+			'			mdl->users++;',
+			'			lod.level = level;',
+			'		}',
+			'	}',
+		]
+	helper_funcs.append('}')
+	draw_loop.append("	netghost_select_lods();")
+
+	## render queue sorted by shader program, then mesh and material,
+	## so consecutive draws share as much GL state as possible
+	queue.sort()
+	if queue:
+		o.append("unsigned short __draw_queue__[%s];" % len(queue))
+		for i, (sname, key, mat, n) in enumerate(queue):
+			init_meshes.append("	__draw_queue__[%s] = __ID__%s;" % (i, n))
+		draw_loop += [
+			"#ifdef NETGHOST_DEBUG",
+			'	std::cout << "drawing: %s" << std::endl;' % " ".join(q[-1] for q in queue),
+			"#endif",
+			"	ECS::get().DrawEntityQueue(__draw_queue__, %s);" % len(queue),
+		]
+	for i, (key, sname) in sorted(enumerate(groups), key=lambda g: (g[1][1], g[1][0])):
+		draw_loop.append("	instances_%s->Draw(*shader_%s_instanced, *Globals::get().camera);" % (i, sname))
+	draw_loop += script_loop
 
-			indices = [str(i) for i in meshes[n]["indices"]]
+	## the cull writes culled_flag of the entities, so the ECS shadow passes skip the same objects,
+	## visible_flag stays with the user and the scripts
+	o += [
+		"#define NGHOST_CULL_ITEMS %s" % len(boxes),
+		"const BVHNode __bvh__[%s] = {" % max(1, len(bvh)),
+	]
+	for lo, hi, first, count, skip in bvh:
+		o.append("	{{%sf, %sf, %sf}, {%sf, %sf, %sf}, %s, %s, %s}," % tuple(lo + hi + [first, count, skip]))
+	o += [
+		"};",
+		"const unsigned short __bvh_items__[%s] = {%s};" % (max(1, len(bvh_items)), ", ".join(str(i) for i in bvh_items) or "0"),
+		"const unsigned short __cull_weights__[%s] = {%s};" % (max(1, len(weights)), ", ".join(str(w) for w in weights) or "0"),
+		"unsigned char __cull_dynamic__[%s] = {%s};" % (max(1, len(dynamic)), ", ".join(str(d) for d in dynamic) or "0"),
+		"unsigned char __visible__[%s];" % max(1, len(boxes)),
+		"unsigned short __cull_ids__[%s];" % max(1, len(entities)),
+	]
+	helper_funcs += [
+		'EMSCRIPTEN_KEEPALIVE',
+		'extern "C" void netghost_cull(){',
+		'	unsigned int drawn = 0, total = 0;',
+	]
+	if boxes:
+		helper_funcs += [
+			'	Frustum frustum(Globals::get().camera->getMatrix());',
+			'	frustum.cull(__bvh__, %s, __bvh_items__, __visible__);' % len(bvh),
+			'	for (unsigned int i = 0; i < NGHOST_CULL_ITEMS; i++) {',
+			'		if (__cull_dynamic__[i]) __visible__[i] = 1;',
+			'		if (__visible__[i]) drawn += __cull_weights__[i];',
+			'		total += __cull_weights__[i];',
+			'	}',
+		]
+	if entities:
+		helper_funcs += [
+			'	for (unsigned int i = 0; i < %s; i++) {' % len(entities),
+			'		Entity e = ECS::get().getEntity(__cull_ids__[i]);',
+			'		if (e.culled_flag == __visible__[i]) {',
+			'			e.culled_flag = !__visible__[i];',
+			'			ECS::get().updateEntity(e);',
+			'		}',
+			'	}',
+		]
+	for i, g in enumerate(groups):
+		helper_funcs.append('	instances_%s->visible = __visible__[%s];' % (i, len(entities) + i))
+	helper_funcs += [
+		'	Globals::get().objectsDrawn = drawn;',
+		'	Globals::get().objectsCulled = total - drawn;',
+		'}',
+		'EMSCRIPTEN_KEEPALIVE',
+		'extern "C" unsigned int netghost_get_drawn(){',
+		'	return Globals::get().objectsDrawn;',
+		'}',
+		'EMSCRIPTEN_KEEPALIVE',
+		'extern "C" unsigned int netghost_get_culled(){',
+		'	return Globals::get().objectsCulled;',
+		'}',
+	]
+	if gen_ctypes is not None:
+		gen_ctypes['netghost_cull'] = []
+		gen_ctypes['netghost_get_drawn'] = []
+		gen_ctypes['netghost_get_culled'] = []
+	if gen_js is not None:
+		gen_js['netghost_get_drawn'] = 'function () {return Module.ccall("netghost_get_drawn", "number", [], []);}'
+		gen_js['netghost_get_culled'] = 'function () {return Module.ccall("netghost_get_culled", "number", [], []);}'
 
-			init_meshes += [
-				"	std::vector<Vertex> _verts_%s;" % n,
-				"	for (auto i=0; i<%s; i++){" % len(verts),
-				"		auto x = _arr_%s[i].x;" % n,
-				"		auto y = _arr_%s[i].y;" % n,
-				"		auto z = _arr_%s[i].z;" % n,
-				"		auto v = glm::vec3(x,y,z);",
-				"		x = _narr_%s[i].x;" % n,
-				"		y = _narr_%s[i].y;" % n,
-				"		z = _narr_%s[i].z;" % n,
-				"		auto norms = glm::vec3(x,y,z);",
-				"		auto uv = glm::vec2(0,0);",  ## TODO
-				"		_verts_%s.push_back(Vertex{v,norms,uv});" % n,
-				"	}",
-
-				"	static const auto _indices_%s = std::vector<GLuint>{%s};" % (n, ",".join(indices)),
-
-				"	mesh_%s = new Mesh(_verts_%s, _indices_%s);" % (n, n, n),
-				"	transform_%s = new Transform();" % n,
-				"	trf = transform_%s;" % n,
-				"	trf->setTranslation(glm::vec3(%sf, %sf, %sf));" % tuple(meshes[n]["pos"]),
-				"	trf->setScale(glm::vec3(%sf, %sf, %sf));" % tuple(meshes[n]["scl"]),
-
-				"	trf->setRotation(glm::vec3(%sf, %sf, %sf));" % tuple(meshes[n]["rot"]),
-
-				"	mdl = new Model();",
-				## this probably should be a pointer to the mesh, not a copy.  using std::move here breaks the shareablity of the Mesh with other models
-				"	mdl->meshes.push_back(*mesh_%s);" % n,
-				'	std::cout << "mesh init: %s" << std::endl;' % n,
-				"	entID = ECS::get().createEntity();",
-				"	__ID__%s = (unsigned short)entID;" % n,
-				"	ECS::get().addModel(entID, mdl);",
-				"	ECS::get().addCamera(entID, Globals::get().camera);",
-				"	ECS::get().addTransform(entID, trf);",
-				"	ECS::get().addWireFrame(entID, 3.0f, 4.0f, 6.0f);",
-			]
-			if "shader" in meshes[n]:
-				sname = meshes[n]["shader"]
-				init_meshes.append("ECS::get().addShader(entID, *shader_%s);" % sname)
-			else:
-				init_meshes.append("ECS::get().addShader(entID, *shader_wire);")
+	helper_funcs += [
+		'EMSCRIPTEN_KEEPALIVE',
+		'extern "C" unsigned int netghost_get_draw_calls(){',
+		'	return Globals::get().drawCalls;',
+		'}',
+		'EMSCRIPTEN_KEEPALIVE',
+		'extern "C" unsigned int netghost_get_state_changes(){',
+		'	return Globals::get().stateChanges;',
+		'}',
+	]
+	if gen_ctypes is not None:
+		gen_ctypes['netghost_get_draw_calls'] = []
+		gen_ctypes['netghost_get_state_changes'] = []
+	if gen_js is not None:
+		gen_js['netghost_get_draw_calls'] = 'function () {return Module.ccall("netghost_get_draw_calls", "number", [], []);}'
+		gen_js['netghost_get_state_changes'] = 'function () {return Module.ccall("netghost_get_state_changes", "number", [], []);}'
 
 	init_meshes.append("}")
+	clear_meshes.append("}")
 	init_cameras.append("}")
 	init_lights.append("}")
 
-	if not shaders:
-		## use all the default shaders in ./Resources/shaders/*.glsl
-		shaders.update( get_default_shaders() )
-	else:
-		# note: the text shader is minimal required for engine
-		if 'text' not in shaders:
-			## the user could define their own? our text shader probably should be called __text__
-			shaders['text'] = get_default_shaders()['text']
-
 
 	init_shaders = [
 		'EMSCRIPTEN_KEEPALIVE',
@@ -765,12 +2035,22 @@ def genmain( gen_ctypes=None, gen_js=None, basis_universal=True ):
 		s = shaders[tag]
 		if "vert" in s and "frag" in s:
 			o.append("Shader *shader_%s;" % tag)
+			defines = s.get("defines")
+			o += asset_decl("shader_%s_vert" % tag, preprocess_glsl(s["vert"], defines, tag + " vert").encode(), gen_assets)
+			o += asset_decl("shader_%s_frag" % tag, preprocess_glsl(s["frag"], defines, tag + " frag").encode(), gen_assets)
 			init_shaders += [
 				'	std::cout << "shader init: %s" << std::endl;' % tag,
 				"	shader_%s = new Shader();" % tag,
-				'	shader_%s->set_vshader("%s");' % (tag, minify(s["vert"])),
-				'	shader_%s->set_fshader("%s");' % (tag, minify(s["frag"])),
+				'	shader_%s->load(%s, %s);' % (tag, asset_string("shader_%s_vert" % tag), asset_string("shader_%s_frag" % tag)),
 			]
+			if tag in instanced_shaders:
+				## same fragment shader, the vertex shader reads the transforms per instance
+				o.append("Shader *shader_%s_instanced;" % tag)
+				o += asset_decl("shader_%s_instanced_vert" % tag, instanced_vshader(s["vert"], defines).encode(), gen_assets)
+				init_shaders += [
+					"	shader_%s_instanced = new Shader();" % tag,
+					'	shader_%s_instanced->load(%s, %s);' % (tag, asset_string("shader_%s_instanced_vert" % tag), asset_string("shader_%s_frag" % tag)),
+				]
 	init_shaders.append("}")
 
 
@@ -781,7 +2061,7 @@ def genmain( gen_ctypes=None, gen_js=None, basis_universal=True ):
 		gen_js['__ghostuser__'] = 'function(){%s;}' % ';'.join(user_js)
 
 	o = "\n".join(
-		o + helper_funcs + init_shaders + init_cameras + init_lights + init_meshes + draw_loop
+		o + helper_funcs + init_shaders + init_cameras + init_lights + init_meshes + clear_meshes + draw_loop
 	)
 	return o
 
@@ -800,92 +2080,767 @@ def gen_js_wrapper( info ):
 	return '\n'.join(js)
 
 
+## @Build
+# run loop of the generated scene (see NGHOST_LOCAL_VARS): --loop=variable|fixed|tick,
+# --tick-rate=HZ, --frame-cap=FPS and --render-divisor=N, all can be changed at runtime too
+##
+LOOP_MODES = {
+	"variable": "NGHOST_LOOP_VARIABLE",
+	"fixed": "NGHOST_LOOP_FIXED",
+	"tick": "NGHOST_LOOP_TICK_ONLY",
+}
+
+## value of a --flag=N argument, exits with usage when it does not parse or ok() rejects it
+def flag_value(arg, parse, ok, usage, text=None):
+	try:
+		value = parse(arg.split("=")[-1] if text is None else text)
+	except ValueError:
+		value = None
+	if value is None or not ok(value):
+		sys.exit("build.py: bad %s, %s" % (arg, usage))
+	return value
+
+def get_loop_defines():
+	defines = []
+	for arg in sys.argv:
+		if arg.startswith("--loop="):
+			mode = arg.split("=")[-1]
+			if mode not in LOOP_MODES:
+				sys.exit("build.py: unknown --loop=%s, accepted values: %s" % (mode, "|".join(LOOP_MODES)))
+			defines.append("-DNGHOST_LOOP_MODE=%s" % LOOP_MODES[mode])
+		elif arg.startswith("--tick-rate="):
+			hz = flag_value(arg, float, lambda v: math.isfinite(v) and v > 0, "the tick rate is in Hz and has to be a number above 0")
+			defines.append("-DNGHOST_TICK_RATE=%s" % hz)
+		elif arg.startswith("--frame-cap="):
+			fps = flag_value(arg, float, lambda v: math.isfinite(v) and v >= 0, "the frame cap is in frames per second, 0 for uncapped")
+			defines.append("-DNGHOST_FRAME_CAP=%s" % fps)
+		elif arg.startswith("--render-divisor="):
+			n = flag_value(arg, int, lambda v: v >= 1, "the render divisor draws every Nth frame and has to be a whole number of 1 or more")
+			defines.append("-DNGHOST_RENDER_DIVISOR=%s" % n)
+	return defines
+
+
+## @Build
+# number of parallel compile jobs, from -jN / -j N / --jobs=N (defaults to the core count)
+##
+JOBS_USAGE = "the job count has to be a whole number of 1 or more (-jN, -j N or --jobs=N)"
+
+def get_jobs():
+	for i, arg in enumerate(sys.argv):
+		if arg.startswith("--jobs="):
+			return flag_value(arg, int, lambda v: v >= 1, JOBS_USAGE)
+		if arg.startswith("-j"):
+			if arg[2:]:
+				return flag_value(arg, int, lambda v: v >= 1, JOBS_USAGE, arg[2:])
+			## a bare -j keeps the core count unless a number follows
+			if i + 1 < len(sys.argv) and sys.argv[i + 1].lstrip("-").isdigit():
+				return flag_value("-j " + sys.argv[i + 1], int, lambda v: v >= 1, JOBS_USAGE, sys.argv[i + 1])
+	return os.cpu_count() or 1
+
+
+## @Build
+# build timing report: every stage records a span and the outputs record their size,
+# written as json plus a chrome trace (load it in chrome://tracing or ui.perfetto.dev)
+##
+BUILD_REPORT = "/tmp/netghost-build-report.json"
+BUILD_TRACE = "/tmp/netghost-build-trace.json"
+REGRESSION_TOLERANCE = 0.10  ## flag stages 10% slower / outputs 10% bigger than the baseline
+_spans = []
+_sizes = {}
+_spans_lock = threading.Lock()
+_build_start = time.time()
+
+def report_reset():
+	global _build_start
+	_spans.clear()
+	_sizes.clear()
+	_build_start = time.time()
+
+def record_span(name, cat, start, end):
+	with _spans_lock:
+		_spans.append({
+			"name": name,
+			"cat": cat,
+			"start": start - _build_start,
+			"dur": end - start,
+			"tid": threading.current_thread().name,
+		})
+
+@contextlib.contextmanager
+def stage(name, cat="build"):
+	start = time.time()
+	try:
+		yield
+	finally:
+		record_span(name, cat, start, time.time())
+
+## data is either generated source/asset bytes or the path of a build output
+def record_size(name, data):
+	if isinstance(data, str) and os.path.isfile(data):
+		_sizes[name] = os.path.getsize(data)
+	else:
+		_sizes[name] = len(data)
+
+def write_report():
+	stages = {}
+	for span in _spans:
+		stages[span["name"]] = stages.get(span["name"], 0.0) + span["dur"]
+	report = {
+		"time": _build_start,
+		"argv": sys.argv[1:],
+		"total": time.time() - _build_start,
+		"stages": stages,
+		"sizes": _sizes,
+	}
+	open(BUILD_REPORT, "w").write(json.dumps(report, indent=1))
+
+	## chrome trace-event format, complete events in microseconds, one row per thread
+	tids = {}
+	events = []
+	for span in _spans:
+		events.append({
+			"name": span["name"],
+			"cat": span["cat"],
+			"ph": "X",
+			"ts": int(span["start"] * 1e6),
+			"dur": int(span["dur"] * 1e6),
+			"pid": 1,
+			"tid": tids.setdefault(span["tid"], len(tids)),
+		})
+	open(BUILD_TRACE, "w").write(json.dumps({"traceEvents": events}))
+	print("build report: %s (%.2fs), trace: %s" % (BUILD_REPORT, report["total"], BUILD_TRACE))
+	return report
+
+def build_done(output):
+	record_size(os.path.basename(output), output)
+	write_report()
+	return output
+
+
+## @Build
+# compare the last build report against a stored baseline,
+# small absolute changes are ignored so noise on tiny stages is not flagged
+##
+def get_baseline():
+	for arg in sys.argv:
+		if arg.startswith(("--compare=", "--save-baseline=")):
+			return arg.split("=", 1)[-1]
+	return os.path.join(CACHE_DIR, "baseline.json")
+
+def compare_report(baseline, report=BUILD_REPORT, tolerance=REGRESSION_TOLERANCE):
+	if not os.path.isfile(baseline):
+		sys.exit("build.py: no build baseline at %s, run a build and --save-baseline first" % baseline)
+	if not os.path.isfile(report):
+		sys.exit("build.py: no build report at %s, run a build first" % report)
+	base = json.loads(open(baseline).read())
+	cur = json.loads(open(report).read())
+	regressions = []
+	for key, unit, fmt, minimum in (("stages", "s", "%.2f", 0.05), ("sizes", "B", "%d", 1024)):
+		for name in sorted(set(base[key]) | set(cur[key])):
+			if name not in cur[key]:
+				print("  removed  %s" % name)
+				continue
+			if name not in base[key]:
+				print("  new      %s: %s%s" % (name, fmt % cur[key][name], unit))
+				continue
+			a = base[key][name]
+			b = cur[key][name]
+			if b - a > minimum and b > a * (1 + tolerance):
+				regressions.append(name)
+				tag = "REGRESS"
+			else:
+				tag = "ok"
+			print("  %-8s %s: %s -> %s%s" % (tag, name, fmt % a, fmt % b, unit))
+	print("total: %.2fs -> %.2fs" % (base["total"], cur["total"]))
+	if regressions:
+		print("ERROR: %s regressions against %s" % (len(regressions), baseline))
+	return regressions
+
+def save_baseline(baseline, report=BUILD_REPORT):
+	if not os.path.isfile(report):
+		sys.exit("build.py: no build report at %s, run a build before --save-baseline" % report)
+	os.makedirs(os.path.dirname(baseline) or ".", exist_ok=True)
+	open(baseline, "w").write(open(report).read())
+	print("saved build baseline:", baseline)
+
+
+## @Build
+# run compile jobs concurrently, output of each job is printed as one block when it finishes,
+# the first failure kills the running jobs and skips the ones still waiting
+##
+def run_jobs(jobs, njobs=None, on_done=None, cat="compile"):
+	if njobs is None:
+		njobs = get_jobs()
+	lock = threading.Lock()
+	cancel = threading.Event()
+	running = set()
+	failed = []
+	done = [0]
+
+	def stop():
+		cancel.set()
+		for p in running:
+			p.terminate()
+
+	def run(name, cmd):
+		if cancel.is_set():
+			return
+		start = time.time()
+		with lock:
+			if cancel.is_set():
+				return
+			try:
+				proc = subprocess.Popen(cmd, stdout=subprocess.PIPE, stderr=subprocess.STDOUT, text=True)
+			except OSError as err:
+				## missing compiler: fails like a non-zero exit (127 is the shell's "not found")
+				print("ERROR: %s: %s" % (name, err))
+				failed.append((name, cmd, 127))
+				stop()
+				return
+			running.add(proc)
+		out, _ = proc.communicate()
+		record_span(name, cat, start, time.time())
+		with lock:
+			running.discard(proc)
+			if cancel.is_set() and proc.returncode < 0:
+				## killed by us after another job failed
+				return
+			done[0] += 1
+			print("[%s/%s] %s (%.2fs)" % (done[0], len(jobs), name, time.time() - start))
+			print(cmd)
+			if out.strip():
+				print(out.rstrip())
+			if proc.returncode == 0:
+				if on_done:
+					try:
+						on_done(name, cmd)
+					except BaseException:
+						stop()
+						raise
+			elif not cancel.is_set():
+				failed.append((name, cmd, proc.returncode))
+				stop()
+
+	if not jobs:
+		print("nothing to compile, all objects are up to date")
+		return
+	print("compiling %s files with %s jobs" % (len(jobs), njobs))
+	with ThreadPoolExecutor(max_workers=max(1, njobs)) as pool:
+		futures = [pool.submit(run, name, cmd) for name, cmd in jobs]
+	## errors raised inside run() (on_done bookkeeping) fail the build instead of vanishing
+	for f in futures:
+		f.result()
+
+	if failed:
+		name, cmd, code = failed[0]
+		print("ERROR: compile failed:", name)
+		raise subprocess.CalledProcessError(code, cmd)
+
+
+## @Build
+# incremental build manifest: each object records its compile command and the content hash
+# of every file it was built from (the source plus headers from the compiler depfile)
+##
+BUILD_MANIFEST = "/tmp/netghost-build.json"
+_file_hashes = {}
+_manifest = None  ## kept across rebuilds in --watch mode
+
+def file_hash(path):
+	if path not in _file_hashes:
+		try:
+			_file_hashes[path] = hashlib.sha1(open(path, "rb").read()).hexdigest()
+		except OSError:
+			_file_hashes[path] = None
+	return _file_hashes[path]
+
+def load_manifest():
+	if _manifest is not None:
+		return _manifest
+	if "--rebuild" in sys.argv or not os.path.isfile(BUILD_MANIFEST):
+		return {}
+	try:
+		return json.loads(open(BUILD_MANIFEST).read())
+	except ValueError:
+		print("WARN: ignoring broken build manifest", BUILD_MANIFEST)
+		return {}
+
+def save_manifest(manifest):
+	global _manifest
+	if "--watch" in sys.argv:
+		_manifest = manifest
+	tmp = BUILD_MANIFEST + ".tmp"
+	open(tmp, "w").write(json.dumps(manifest, indent=1))
+	os.replace(tmp, BUILD_MANIFEST)
+
+def read_depfile(dfile):
+	## make syntax: "out.o: a.cpp a.h \\\n b.h"
+	txt = open(dfile).read().replace("\\\n", " ")
+	txt = txt.split(":", 1)[-1].replace("\\ ", "\0")
+	return [d.replace("\0", " ") for d in txt.split()]
+
+## adds the depfile flags and returns the cmd, gcc/clang/emcc all support -MMD
+def depfile_cmd(cmd, ofile):
+	return cmd + ["-MMD", "-MF", ofile + ".d"]
+
+def is_stale(manifest, ofile, cmd):
+	entry = manifest.get(ofile)
+	if not entry or not os.path.isfile(ofile):
+		return True
+	if entry["cmd"] != cmd:
+		return True
+	for dep, h in entry["deps"].items():
+		if file_hash(dep) != h:
+			return True
+	return False
+
+def record_object(manifest, ofile, cmd, source, extra_deps=()):
+	deps = [source] + list(extra_deps)
+	if os.path.isfile(ofile + ".d"):
+		deps += read_depfile(ofile + ".d")
+	manifest[ofile] = {
+		"cmd": cmd,
+		"deps": {os.path.abspath(d): file_hash(os.path.abspath(d)) for d in deps},
+	}
+
+
+## @Build
+# persistent object cache for third-party code that never changes between scenes,
+# objects are keyed by toolchain, flags and source hash and revalidated against their depfile
+##
+CACHE_DIR = os.environ.get("NETGHOST_CACHE", os.path.expanduser("~/.cache/netghost"))
+THIRD_PARTY = ("dr_wav.c", "stb.cpp")
+_toolchains = {}
+
+def toolchain_id(compiler):
+	if compiler not in _toolchains:
+		try:
+			ver = subprocess.check_output([compiler, "--version"], stderr=subprocess.STDOUT, text=True)
+		except (OSError, subprocess.CalledProcessError):
+			ver = ""
+		_toolchains[compiler] = compiler + "\n" + ver
+	return _toolchains[compiler]
+
+## returns the cached object path and the compile cmd, or None if the cached object is valid
+def objcache_lookup(cmd, source):
+	flags = [a for a in cmd if a != source]
+	key = hashlib.sha1(json.dumps([toolchain_id(cmd[0]), flags, file_hash(source)]).encode()).hexdigest()
+	objdir = os.path.join(CACHE_DIR, "objects")
+	os.makedirs(objdir, exist_ok=True)
+	ofile = os.path.join(objdir, "%s-%s.o" % (os.path.basename(source), key[:16]))
+	info = ofile + ".json"
+	if "--rebuild" not in sys.argv and os.path.isfile(ofile) and os.path.isfile(info):
+		deps = json.loads(open(info).read())
+		if all(file_hash(d) == h for d, h in deps.items()):
+			return ofile, None
+	return ofile, cmd + ["-o", ofile, "-MMD", "-MF", ofile + ".d"]
+
+def objcache_store(ofile, source):
+	deps = [source] + read_depfile(ofile + ".d")
+	deps = {os.path.abspath(d): file_hash(os.path.abspath(d)) for d in deps}
+	open(ofile + ".json", "w").write(json.dumps(deps, indent=1))
+
+
+## @Build
+# precompiled headers: the heavy third-party headers shared by every engine file,
+# the generated main also precompiles Scene.h which pulls in most of the engine
+##
+PCH_DIR = "/tmp/pch"
+PCH_COMMON = [
+	"#define GLEW_STATIC",
+	"#define GLM_ENABLE_EXPERIMENTAL",
+	"#include <GL/glew.h>",
+	"#include <GLFW/glfw3.h>",
+	"#include <string>",
+	"#include <vector>",
+	"#include <map>",
+	"#include <unordered_map>",
+	"#include <unordered_set>",
+	"#include <queue>",
+	"#include <iostream>",
+	"#include <fstream>",
+	"#include <sstream>",
+	'#include "glm/glm.hpp"',
+	'#include "glm/gtc/matrix_transform.hpp"',
+	'#include "glm/gtc/type_ptr.hpp"',
+	'#include "glm/gtx/rotate_vector.hpp"',
+	'#include "glm/gtx/vector_angle.hpp"',
+	"#include <glm/gtx/string_cast.hpp>",
+	'#include "btBulletDynamicsCommon.h"',
+]
+
+## compile flags of a translation unit without its input/output
+def pch_flags(cmd, ofile, source):
+	flags = []
+	skip = False
+	for a in cmd:
+		if skip:
+			skip = False
+		elif a == "-o":
+			skip = True
+		elif a not in ("-c", source):
+			flags.append(a)
+	return flags
+
+## returns the header to force include and the cmd that precompiles it
+def pch_header(flags, scene=False):
+	lines = PCH_COMMON + (['#include "Scene.h"'] if scene else [])
+	key = hashlib.sha1(json.dumps([flags, lines]).encode()).hexdigest()[:16]
+	pdir = os.path.join(PCH_DIR, key)
+	os.makedirs(pdir, exist_ok=True)
+	hdr = os.path.join(pdir, "netghost_pch.h")
+	txt = "\n".join(lines) + "\n"
+	if not os.path.isfile(hdr) or open(hdr).read() != txt:
+		open(hdr, "w").write(txt)
+	## gcc looks for header.gch, clang (emcc) for header.pch
+	out = hdr + (".pch" if flags[0] == EMCC else ".gch")
+	return hdr, out, flags + ["-x", "c++-header", hdr, "-o", out]
+
+## parse time of each file with and without the precompiled header
+def pch_report(tus):
+	print("%-28s %10s %10s" % ("file", "no-pch", "pch"))
+	total = [0.0, 0.0]
+	for name, flags, source, hdr in tus:
+		times = []
+		for extra in ([], ["-include", hdr]):
+			start = time.time()
+			subprocess.call(flags + extra + ["-fsyntax-only", source])
+			times.append(time.time() - start)
+		total[0] += times[0]
+		total[1] += times[1]
+		print("%-28s %9.2fs %9.2fs" % (name, times[0], times[1]))
+	print("%-28s %9.2fs %9.2fs" % ("total", total[0], total[1]))
+
+
+## @Build
+# turn a binary asset into an object file without going through the C++ parser:
+# gas .incbin natively, C23 #embed with emcc, objects are cached by content hash
+##
+def embed_asset(name, data, wasm=False):
+	sym, size = asset_symbols(name)
+	compiler = EMCC if wasm else C
+	key = hashlib.sha1(data + json.dumps([toolchain_id(compiler), sym]).encode()).hexdigest()[:16]
+	adir = os.path.join(CACHE_DIR, "assets")
+	os.makedirs(adir, exist_ok=True)
+	ofile = os.path.join(adir, "%s-%s.o" % (name, key))
+	if os.path.isfile(ofile) and "--rebuild" not in sys.argv:
+		return ofile, None
+	blob = os.path.join(adir, "%s-%s.bin" % (name, key))
+	open(blob, "wb").write(data)
+	if wasm:
+		src = blob[:-4] + ".c"
+		open(src, "w").write("\n".join([
+			"const unsigned char %s[] = {" % sym,
+			'#embed "%s"' % blob,
+			"};",
+			"const unsigned int %s = sizeof(%s);" % (size, sym),
+		]) + "\n")
+		return ofile, [EMCC, "-std=c23", "-c", src, "-o", ofile]
+	## i686 mingw prefixes C symbols with an underscore
+	prefix = "_" if "--windows" in sys.argv else ""
+	rodata = '.section .rdata,"dr"' if "--windows" in sys.argv else ".section .rodata"
+	src = blob[:-4] + ".S"
+	lines = [
+		rodata,
+		".global %s%s" % (prefix, sym),
+		".global %s%s" % (prefix, size),
+		".balign 16",
+		"%s%s:" % (prefix, sym),
+		'.incbin "%s"' % blob,
+		".byte 0",  ## keeps text assets usable as C strings
+		".balign 4",
+		"%s%s:" % (prefix, size),
+		".int %s" % len(data),
+	]
+	if "--windows" not in sys.argv:
+		lines.append('.section .note.GNU-stack,"",@progbits')
+	open(src, "w").write("\n".join(lines) + "\n")
+	return ofile, [C, "-c", src, "-o", ofile]
+
+
+## @Build
+# unity (jumbo) build: batch the engine files into a few translation units,
+# files defining the same internal symbol (static, const, anonymous namespace) never share a batch
+##
+UNITY_DIR = "/tmp/unity"
+UNITY_INTERNAL = re.compile(r"^(?:static|const|constexpr)\b(?!_assert)[^;(=\[{]*?\b(\w+)\s*(?:\(|=|\[|;|\{)")
+UNITY_DEFINE = re.compile(r"^\s*#\s*define\s+(\w+)")
+
+def get_unity_batches():
+	for arg in sys.argv:
+		if arg.startswith("--unity-batches="):
+			return max(1, int(arg.split("=")[-1]))
+	return 4
+
+## internal symbols (name -> defining file) of a file and the local headers it includes,
+## the macros it defines itself, and whether it can be batched at all
+def unity_scan(path, seen=None):
+	if seen is None:
+		seen = set()
+	seen.add(path)
+	symbols = {}
+	macros = []
+	batchable = True
+	for ln in open(path, errors="replace").read().splitlines():
+		m = UNITY_INTERNAL.match(ln)
+		if m:
+			symbols[m.group(1)] = path
+		m = UNITY_DEFINE.match(ln)
+		if m and m.group(1) not in macros:
+			macros.append(m.group(1))
+		if re.match(r"^\s*namespace\s*\{", ln):
+			## anonymous namespaces would need a real parser to list
+			batchable = False
+		m = re.match(r'^\s*#\s*include\s*"([^"]+)"', ln)
+		if m:
+			hdr = os.path.join(srcdir, m.group(1))
+			if hdr not in seen and os.path.isfile(hdr):
+				hsyms, hmacros, hbatchable = unity_scan(hdr, seen)
+				symbols.update(hsyms)
+				batchable = batchable and hbatchable
+	return symbols, macros, batchable
+
+def unity_batches(files, nbatches):
+	info = {f: unity_scan(os.path.join(srcdir, f)) for f in files}
+	batches = [[] for i in range(min(nbatches, len(files)))]
+	weight = [0] * len(batches)
+	names = [{} for b in batches]
+	alone = []
+	collisions = []
+
+	## the same name from two different files, headers shared by both are fine (include guards)
+	def clashes(i, symbols):
+		return sorted(n for n in symbols if n in names[i] and names[i][n] != symbols[n])
+
+	## biggest files first, each into the lightest batch it does not collide with
+	for f in sorted(files, key=lambda f: -os.path.getsize(os.path.join(srcdir, f))):
+		symbols, macros, batchable = info[f]
+		if not batchable:
+			alone.append(f)
+			continue
+		ok = []
+		for i in range(len(batches)):
+			clash = clashes(i, symbols)
+			for n in clash:
+				collisions.append((n, f, [g for g in batches[i] if n in info[g][0]]))
+			if not clash:
+				ok.append(i)
+		if not ok:
+			alone.append(f)
+			continue
+		i = min(ok, key=lambda i: weight[i])
+		batches[i].append(f)
+		names[i].update(symbols)
+		weight[i] += os.path.getsize(os.path.join(srcdir, f))
+
+	for n, f, others in collisions:
+		print("unity: '%s' in %s collides with %s" % (n, f, ",".join(others)))
+	for f in alone:
+		print("unity: %s cannot be batched, compiling it alone" % f)
+
+	os.makedirs(UNITY_DIR, exist_ok=True)
+	units = []
+	for i, batch in enumerate(b for b in batches if b):
+		lines = ["// generated by build.py --unity"]
+		for f in sorted(batch):
+			lines.append('#include "%s"' % os.path.join(srcdir, f))
+			## keep file local macros from leaking into the next file
+			lines += ["#undef %s" % m for m in info[f][1]]
+		path = os.path.join(UNITY_DIR, "unity_%s.cpp" % i)
+		txt = "\n".join(lines) + "\n"
+		if not os.path.isfile(path) or open(path).read() != txt:
+			open(path, "w").write(txt)
+		units.append(path)
+	return units, alone
+
+
 ## @Build
 # call the compiler/linker to produce cmd output for compiler/linker warnings & errors
 ##
 def build(
 	shared=True, assimp=False, wasm=False, debug_shaders="--debug-shaders" in sys.argv,
-	gen_ctypes=False, basis_universal=True, gen_main=True,
+	gen_ctypes=False, basis_universal=True, gen_main=True, load=True,
 ):
 
 	if wasm: gen_js = {}
+	gen_assets = {}
+	report_reset()
 
-	cpps = []
+	## generate the scene first so __main__.cpp compiles alongside the engine
+	if gen_main:
+		tmp_main = "/tmp/__main__.cpp"
+		with stage("genmain", "codegen"):
+			if '--wasm' in sys.argv:
+				src = genmain( gen_js=gen_js, gen_assets=gen_assets)
+			else:
+				src = genmain( gen_ctypes=gen_ctypes, gen_assets=gen_assets)
+		open(tmp_main, "w").write(src)
+		record_size("__main__.cpp", src)
+		for name in gen_assets:
+			record_size(name, gen_assets[name])
+
+	_file_hashes.clear()
+	manifest = load_manifest()
+	outputs = {}
+	pchs = {}
+	pch_tus = []
+	jobs = []
 	obfiles = []
-	for file in os.listdir(srcdir):
-		if file == "Main.cpp" and gen_main:
-			continue
+	use_pch = "--no-pch" not in sys.argv
+
+	## queue the object only if it is missing or was built from other sources/flags,
+	## engine files get the common headers precompiled once per flag set
+	def add_job(name, ofile, cmd, source, scene=False):
+		pch = None
+		if use_pch:
+			flags = pch_flags(cmd, ofile, source)
+			hdr, pch, pcmd = pch_header(flags, scene)
+			pchs[pch] = (hdr, depfile_cmd(pcmd, pch))
+			pch_tus.append((name, flags, source, hdr))
+			cmd = cmd + ["-include", hdr, "-Winvalid-pch"]
+		cmd = depfile_cmd(cmd, ofile)
+		obfiles.append(ofile)
+		outputs[name] = (ofile, source, False, pch)
+		if is_stale(manifest, ofile, cmd):
+			jobs.append((name, cmd))
+
+	## third-party objects go to the persistent cache instead of /tmp
+	def add_cached_job(name, cmd, source):
+		ofile, cmd = objcache_lookup(cmd, source)
+		obfiles.append(ofile)
+		outputs[name] = (ofile, source, True, None)
+		if cmd:
+			jobs.append((name, cmd))
+		else:
+			print("using cached object:", ofile)
+
+	def on_done(name, cmd):
+		ofile, source, cached, pch = outputs[name]
+		if cached and source:
+			objcache_store(ofile, source)
+		elif pch:
+			## the depfile of a file using a pch does not list the headers inside it
+			hdr = pchs[pch][0]
+			record_object(manifest, ofile, cmd, source, [hdr] + read_depfile(pch + ".d"))
+		else:
+			record_object(manifest, ofile, cmd, source)
+
+	def engine_cmd(ofile, source):
+		cmd = [
+			CC,
+			"-std=c++20",
+			"-c",  ## do not call the linker
+			"-fPIC",  ## position indepenent code
+			"-o",
+			ofile,
+			source,
+		]
+		if not assimp:
+			cmd.append("-DNOASS")
+		if debug_shaders:
+			cmd.append("-DDEBUG_SHADERS")
+		if "--debug" in sys.argv:
+			## per-frame logging
+			cmd.append("-DNETGHOST_DEBUG")
+		cmd += includes
+		cmd += hacks
+		return cmd
+
+	files = sorted(os.listdir(srcdir))
+	if gen_main and "Main.cpp" in files:
+		files.remove("Main.cpp")
+	if "--unity" in sys.argv:
+		## Main.cpp is the app entry point, it stays out of the engine library
+		engine = [f for f in files if f.endswith(".cpp") and f not in THIRD_PARTY and f != "Main.cpp"]
+		units, alone = unity_batches(engine, get_unity_batches())
+		for unit in units:
+			name = os.path.basename(unit)
+			ofile = "/tmp/%s.o" % name
+			add_job(name, ofile, engine_cmd(ofile, unit), unit)
+		files = [f for f in files if f not in engine or f in alone]
+
+	## the scene (generated main, its assets or Main.cpp) links on top of the engine library
+	scene_objs = []
+	if gen_main:
+		scene_objs.append(tmp_main + ".o")
+	elif "Main.cpp" in files:
+		scene_objs.append("/tmp/Main.cpp.o")
+
+	for file in files:
 		if file.endswith(".c"):
 			## this is just for drwave
-			ofile = "/tmp/%s.o" % file
-			obfiles.append(ofile)
-			if os.path.isfile(ofile) and "--fast" in sys.argv:
-				continue
-			cpps.append(file)
 			cmd = [
 				C,
 				"-c",  ## do not call the linker
 				"-fPIC",  ## position indepenent code
-				"-o",
-				ofile,
 				os.path.join(srcdir, file),
 			]
-			print(cmd)
-			subprocess.check_call(cmd)
+			add_cached_job(file, cmd, os.path.join(srcdir, file))
+
+		elif file in THIRD_PARTY:
+			## header only libraries, the engine defines do not apply here
+			cmd = [CC, "-std=c++20", "-c", "-fPIC", os.path.join(srcdir, file)]
+			cmd += includes
+			add_cached_job(file, cmd, os.path.join(srcdir, file))
 
 		elif file.endswith(".cpp"):
 			ofile = "/tmp/%s.o" % file
-			obfiles.append(ofile)
-			if os.path.isfile(ofile) and "--fast" in sys.argv:
-				continue
-			cpps.append(file)
-			cmd = [
-				CC,
-				"-std=c++20",
-				"-c",  ## do not call the linker
-				"-fPIC",  ## position indepenent code
-				"-o",
-				ofile,
-				os.path.join(srcdir, file),
-			]
-			if not assimp:
-				cmd.append("-DNOASS")
-			if debug_shaders:
-				cmd.append("-DDEBUG_SHADERS")
-			cmd += includes
-			cmd += hacks
-			print(cmd)
-			subprocess.check_call(cmd)
+			add_job(file, ofile, engine_cmd(ofile, os.path.join(srcdir, file)), os.path.join(srcdir, file))
 
 	if basis_universal:
-		buo = '/tmp/basis_universal.o'
-		cmd = [CC, "-std=c++20", "-c", "-fPIC", "-o", buo, os.path.join(__thisdir,'basis_universal/transcoder/basisu_transcoder.cpp')]
+		busrc = os.path.join(__thisdir,'basis_universal/transcoder/basisu_transcoder.cpp')
+		cmd = [CC, "-std=c++20", "-c", "-fPIC", busrc]
 		cmd += includes
-		print(cmd)
-		subprocess.check_call(cmd)
-		obfiles.append(buo)
+		add_cached_job("basisu_transcoder.cpp", cmd, busrc)
 
 	if gen_main:
-		tmp_main = "/tmp/__main__.cpp"
 		tmpo = tmp_main + ".o"
-		obfiles.append(tmpo)
-		if '--wasm' in sys.argv:
-			open(tmp_main, "w").write(genmain( gen_js=gen_js))
-		else:
-			open(tmp_main, "w").write(genmain( gen_ctypes=gen_ctypes))
 		cmd = [CC, "-std=c++20", "-c", "-fPIC", "-o", tmpo, tmp_main]
 		if not assimp:
 			cmd.append("-DNOASS")
 		if debug_shaders:
 			cmd.append("-DDEBUG_SHADERS")
+		if "--debug" in sys.argv:
+			## per-frame logging
+			cmd.append("-DNETGHOST_DEBUG")
 		if gen_main:
 			cmd.append("-DUSE_EXTERN_FONTS")
+		cmd += get_loop_defines()
 		cmd += includes
 		cmd += hacks
-		print(cmd)
-		subprocess.check_call(cmd)
-
-	os.system("ls -lh /tmp/*.o")
+		add_job("__main__.cpp", tmpo, cmd, tmp_main, scene=True)
+		## the generated main is usually the biggest file, start it first
+		if jobs and jobs[-1][0] == "__main__.cpp":
+			jobs.insert(0, jobs.pop())
+
+	for name in gen_assets:
+		ofile, cmd = embed_asset(name, gen_assets[name], wasm)
+		obfiles.append(ofile)
+		scene_objs.append(ofile)
+		outputs[name] = (ofile, None, True, None)
+		if cmd:
+			jobs.append((name, cmd))
+
+	print("%s of %s objects are out of date" % (len(jobs), len(obfiles)))
+	try:
+		## precompiled headers first, only those needed by a file that is rebuilt
+		needed = set(outputs[name][3] for name, cmd in jobs if outputs[name][3])
+		if "--pch-report" in sys.argv:
+			needed = set(pchs)
+		pch_jobs = []
+		for pch in sorted(needed):
+			hdr, pcmd = pchs[pch]
+			outputs[pch] = (pch, hdr, False, None)
+			if is_stale(manifest, pch, pcmd):
+				pch_jobs.append((pch, pcmd))
+		run_jobs(pch_jobs, on_done=on_done, cat="pch")
+		if "--pch-report" in sys.argv:
+			pch_report(pch_tus)
+		run_jobs(jobs, on_done=on_done)
+	finally:
+		save_manifest(manifest)
+
+
+	os.system("ls -lh /tmp/*.o %s" % " ".join(o for o in obfiles if not o.startswith("/tmp/")))
 
 	if wasm:
 		jslib = '/tmp/ghostlib.js'
@@ -909,7 +2864,7 @@ def build(
 			[
 				EMCC,  #'--no-entry',
 				#'-s', 'ERROR_ON_UNDEFINED_SYMBOLS=0',
-				'-sEXPORTED_RUNTIME_METHODS=ccall,cwrap',
+				'-sEXPORTED_RUNTIME_METHODS=ccall,cwrap,HEAPF32',
 				'--post-js', jslib,
 				"-s","FETCH",
 				"-s","SINGLE_FILE",
@@ -929,52 +2884,148 @@ def build(
 			+ libs
 		)
 		print(cmd)
-		subprocess.check_call(cmd)
-		return "/tmp/netghost.html"
+		with stage("emcc link", "link"):
+			subprocess.check_call(cmd)
+		return build_done("/tmp/netghost.html")
 
 	## finally call the linker,
 	## note: there's better linkers we could use here, like gold and mold
 
-	cmd = (
-		[
-			"g++",
-			"-shared",
-			"-o",
-			"/tmp/obelisk.so",
-		]
-		+ obfiles
-		+ libs
-	)
-	print(cmd)
-	subprocess.check_call(cmd)
+	if "--windows" in sys.argv:
+		## mingw builds stay a single static exe
+		exe = "/tmp/obelisk.exe"
+		cmd = [CC, "-o", exe] + "-static-libgcc -static-libstdc++ -static".split() + obfiles + libs
+		print(cmd)
+		with stage("link", "link"):
+			subprocess.check_call(cmd)
+		return build_done(exe)
+
+	engine_objs = [o for o in obfiles if o not in scene_objs]
+	with stage("link engine", "link"):
+		engine = link_engine(engine_objs, manifest)
+	save_manifest(manifest)
+	record_size(os.path.basename(engine), engine)
 	if shared:
-		return ctypes.CDLL("/tmp/obelisk.so")
+		with stage("link scene", "link"):
+			scene = link_scene(scene_objs, engine)
+		build_done(scene)
+		return load_scene(scene) if load else scene
 
 	exe = "/tmp/obelisk"
-	if "--windows" in sys.argv:
-		exe += ".exe"
-	cmd = [
-		CC,
-		"-o",
-		exe,
-	]
-	if "--windows" in sys.argv:
-		cmd += "-static-libgcc -static-libstdc++ -static".split()
-	cmd += obfiles + libs
+	cmd = [CC, "-o", exe] + scene_objs + [engine, "-Wl,-rpath," + os.path.dirname(engine)] + libs
+	print(cmd)
+	with stage("link", "link"):
+		subprocess.check_call(cmd)
+	return build_done(exe)
+
+
+## @Build
+# the engine library is linked once and only relinked when one of its objects changed
+##
+ENGINE_LIB = "/tmp/libnetghost.so"
+
+def link_engine(objs, manifest):
+	cmd = ["g++", "-shared", "-Wl,-soname,libnetghost.so", "-o", ENGINE_LIB] + objs + libs
+	if not is_stale(manifest, ENGINE_LIB, cmd):
+		print("engine library is up to date:", ENGINE_LIB)
+		return ENGINE_LIB
+	print(cmd)
+	subprocess.check_call(cmd)
+	manifest[ENGINE_LIB] = {
+		"cmd": cmd,
+		"deps": {o: file_hash(o) for o in objs},
+	}
+	return ENGINE_LIB
+
+
+## @Build
+# the scene module is named by the hash of its objects, so a running process can load
+# a new scene next to the old one (dlopen returns the cached handle for a known path)
+##
+def link_scene(objs, engine):
+	key = hashlib.sha1("".join(file_hash(o) or "" for o in objs).encode()).hexdigest()[:16]
+	scene = "/tmp/netghost_scene_%s.so" % key
+	if os.path.isfile(scene):
+		print("scene module is up to date:", scene)
+		return scene
+	cmd = ["g++", "-shared", "-o", scene] + objs + [engine, "-Wl,-rpath," + os.path.dirname(engine)]
 	print(cmd)
 	subprocess.check_call(cmd)
-	return exe
+	return scene
+
+
+## @Build
+# load a scene module on top of the engine library
+##
+def load_scene(scene):
+	ctypes.CDLL(ENGINE_LIB, mode=ctypes.RTLD_GLOBAL)
+	return ctypes.CDLL(scene)
 
 
 ## @Test
 #
 ##
+CTYPES_RESTYPES = {
+	'netghost_get_window': ctypes.c_void_p,
+	'netghost_get_object_name': ctypes.c_char_p,
+	'netghost_get_prop_column': ctypes.POINTER(ctypes.c_float),
+	'netghost_get_frame_stats': ctypes.POINTER(ctypes.c_float),
+	'netghost_get_profile_phase': ctypes.c_char_p,
+}
+
 def bind_lib(lib, cdefs):
 	#lib.netghost_window_init.argtypes = [ctypes.c_int, ctypes.c_int]
 	for n in cdefs:
 		func = getattr(lib, n)
 		print('binding %s: args = %s ptr =%s' %(n,cdefs[n], func))
 		func.argtypes = tuple(cdefs[n])
+	for n in CTYPES_RESTYPES:
+		getattr(lib, n).restype = CTYPES_RESTYPES[n]
+
+
+## @Test
+# a custom prop of every object as one ctypes float array (writes go straight to the scene),
+# use numpy.ctypeslib.as_array on it for a numpy view
+##
+def prop_column(lib, name):
+	ptr = lib.netghost_get_prop_column(name.encode())
+	if not ptr:
+		return None
+	count = lib.netghost_get_object_count()
+	return (ctypes.c_float * count).from_address(ctypes.addressof(ptr.contents))
+
+
+## @Test
+# per-phase frame times from the profiler: {phase: {"cpu": [ms...], "gpu": [ms...]}}, oldest frame first
+##
+def frame_stats(lib):
+	phases = []
+	while lib.netghost_get_profile_phase(len(phases)):
+		phases.append(lib.netghost_get_profile_phase(len(phases)).decode())
+	frames = lib.netghost_get_frame_count()
+	ptr = lib.netghost_get_frame_stats()
+	stats = {}
+	for i, name in enumerate(phases):
+		stats[name] = {
+			"cpu": [ptr[(f * 2) * len(phases) + i] for f in range(frames)],
+			"gpu": [ptr[(f * 2 + 1) * len(phases) + i] for f in range(frames)],
+		}
+	return stats
+
+def percentile(values, p):
+	if not values:
+		return 0.0
+	values = sorted(values)
+	return values[min(len(values) - 1, int(len(values) * p / 100.0))]
+
+def print_frame_stats(lib):
+	stats = frame_stats(lib)
+	print("%-14s %9s %9s %9s %9s %9s" % ("phase", "cpu p50", "cpu p95", "cpu p99", "gpu p50", "gpu p95"))
+	for name in stats:
+		cpu, gpu = stats[name]["cpu"], stats[name]["gpu"]
+		print("%-14s %9.3f %9.3f %9.3f %9.3f %9.3f" % (
+			name, percentile(cpu, 50), percentile(cpu, 95), percentile(cpu, 99),
+			percentile(gpu, 50), percentile(gpu, 95)))
 
 
 ## @Test
@@ -996,7 +3047,212 @@ def test_python():
 	lib.netghost_init_lights()
 	print("init_meshes")
 	lib.netghost_init_meshes()
-	lib.netghost_run()
+	if "--reload" in sys.argv:
+		run_reloadable(lib, gctypes)
+	else:
+		lib.netghost_run()
+	## counters of the last drawn frame, all 0 means netghost_redraw never ran
+	print("drawn: %s culled: %s draw calls: %s state changes: %s" % (
+		lib.netghost_get_drawn(), lib.netghost_get_culled(),
+		lib.netghost_get_draw_calls(), lib.netghost_get_state_changes()))
+	if "--profile" in sys.argv:
+		print_frame_stats(lib)
+
+
+## @Test
+# drive the main loop from python so the watcher can swap in a rebuilt scene module,
+# the new module takes over the window and GL context of the old one
+##
+RELOAD_SOCKET = "/tmp/netghost-reload.sock"
+
+def run_reloadable(lib, gctypes):
+	import socket
+	if os.path.exists(RELOAD_SOCKET):
+		os.unlink(RELOAD_SOCKET)
+	sock = socket.socket(socket.AF_UNIX, socket.SOCK_DGRAM)
+	sock.bind(RELOAD_SOCKET)
+	sock.setblocking(False)
+
+	lib.netghost_run_init()
+	while lib.netghost_frame():
+		try:
+			scene = sock.recv(4096).decode()
+		except BlockingIOError:
+			continue
+		print("reloading scene:", scene)
+		lib.netghost_clear_meshes()
+		new = load_scene(scene)
+		bind_lib(new, gctypes)
+		new.netghost_set_window(ctypes.c_void_p(lib.netghost_get_window()))
+		new.netghost_init_shaders()
+		new.netghost_init_cameras()
+		new.netghost_init_lights()
+		new.netghost_init_meshes()
+		new.netghost_run_init()
+		lib = new
+	lib.netghost_run_cleanup()
+	sock.close()
+	os.unlink(RELOAD_SOCKET)
+
+
+## @Build
+# rebuild on every change to the sources, shaders or the scene and push the new scene
+# module into the running session, a changed engine library restarts the session
+##
+def watch_files():
+	paths = [a for a in sys.argv if a.endswith((".json", ".ngs", ".blend"))]
+	for d in (srcdir, shaders_dir):
+		for name in os.listdir(d):
+			paths.append(os.path.join(d, name))
+	return {p: os.stat(p).st_mtime_ns for p in paths if os.path.isfile(p)}
+
+def watch():
+	import socket
+	args = [a for a in sys.argv if a != "--watch"]
+	sock = socket.socket(socket.AF_UNIX, socket.SOCK_DGRAM)
+	session = None
+	engine = None
+	mtimes = None
+	while True:
+		cur = watch_files()
+		if cur == mtimes:
+			time.sleep(0.2)
+			continue
+		mtimes = cur
+		start = time.time()
+		try:
+			scene = build( gen_ctypes={}, load=False )
+		except Exception as err:
+			## shader typos, failed blender jobs, broken scene files: wait for the next edit
+			print("WATCH: build failed: %s: %s" % (type(err).__name__, err))
+			continue
+		print("WATCH: rebuilt in %.2fs" % (time.time() - start))
+
+		_file_hashes.pop(ENGINE_LIB, None)
+		if session is None or session.poll() is not None or engine != file_hash(ENGINE_LIB):
+			if session and session.poll() is None:
+				session.terminate()
+				session.wait()
+			engine = file_hash(ENGINE_LIB)
+			cmd = [sys.executable] + args + ["--reload"]
+			print(cmd)
+			session = subprocess.Popen(cmd)
+			continue
+		try:
+			sock.sendto(scene.encode(), RELOAD_SOCKET)
+		except OSError as err:
+			print("WATCH: session is not listening:", err)
+
+
+## @Build
+# persistent headless blender workers (blender.py --worker=SOCKET) so builds and watch loops skip the
+# blender startup. a job is one JSON line over a unix socket, the answer one JSON line plus the payload
+# bytes. a .blend always goes to the same worker, which keeps it open until it changes on disk.
+# workers outlive the build, --blender-pool-stop shuts them down, --no-blender-pool launches blender per dump.
+# the socket name carries a hash of blender.py, workers running an older exporter are stopped and replaced
+##
+BLENDER_WORKERS = max(1, int(os.environ.get("NETGHOST_BLENDER_WORKERS", "2")))
+BLENDER_WORKER_TIMEOUT = 120  ## seconds a new worker gets to start listening
+
+def blender_worker_socket(i):
+	## not file_hash(): its memo outlives edits in --watch mode
+	script = hashlib.sha1(open("./blender.py", "rb").read()).hexdigest()[:12]
+	return os.path.join(CACHE_DIR, "blender-%s-%s.sock" % (script, i))
+
+def blender_sockets(i="*"):
+	import glob
+	return glob.glob(os.path.join(CACHE_DIR, "blender-*-%s.sock" % i))
+
+def blender_socket_connect(path):
+	import socket
+	sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+	try:
+		sock.connect(path)
+		return sock
+	except OSError:
+		sock.close()
+		return None
+
+## asks the worker on path to exit, a socket nobody listens on is removed
+def quit_blender_worker(path):
+	sock = blender_socket_connect(path)
+	if not sock:
+		if os.path.exists(path):
+			os.unlink(path)
+		return False
+	with sock:
+		sock.sendall(b'{"job": "quit"}\n')
+		sock.makefile("rb").readline()
+	return True
+
+def blender_connect(i, spawn=True):
+	import fcntl
+	path = blender_worker_socket(i)
+	connect = lambda: blender_socket_connect(path)
+
+	sock = connect()
+	if sock or not spawn:
+		return sock
+	os.makedirs(CACHE_DIR, exist_ok=True)
+	## one build starts the worker, concurrent builds wait for it
+	with open(os.path.join(CACHE_DIR, "blender-%s.lock" % i), "w") as lock:
+		fcntl.flock(lock, fcntl.LOCK_EX)
+		sock = connect()
+		if sock:
+			return sock
+		for stale in blender_sockets(i):
+			if stale != path and quit_blender_worker(stale):
+				print("stopped blender worker %s, blender.py changed" % i)
+		cmd = [BLENDER, "--background", "--python", os.path.abspath("./blender.py"), "--", "--worker=" + path]
+		print(cmd)
+		log = open(os.path.join(CACHE_DIR, "blender-%s.log" % i), "ab")
+		proc = subprocess.Popen(cmd, stdin=subprocess.DEVNULL, stdout=log, stderr=subprocess.STDOUT, start_new_session=True)
+		log.close()
+		start = time.time()
+		while not sock:
+			if proc.poll() is not None:
+				raise subprocess.CalledProcessError(proc.returncode, cmd)
+			if time.time() - start > BLENDER_WORKER_TIMEOUT:
+				proc.kill()
+				raise RuntimeError("blender worker did not start, see %s" % log.name)
+			time.sleep(0.1)
+			sock = connect()
+		print("blender worker %s started in %.2fs" % (i, time.time() - start))
+	return sock
+
+## runs a dump, render or convert job, returns (reply, payload bytes)
+def blender_job(job, blend=None, **args):
+	blend = blend and os.path.abspath(blend)
+	i = int(hashlib.sha1((blend or "").encode()).hexdigest(), 16) % BLENDER_WORKERS
+	with blender_connect(i) as sock:
+		sock.sendall(json.dumps(dict(args, job=job, blend=blend)).encode() + b"\n")
+		f = sock.makefile("rb")
+		reply = json.loads(f.readline())
+		payload = f.read(reply.get("size", 0))
+	if not reply["ok"]:
+		raise RuntimeError("blender worker %s, %s job failed:\n%s" % (i, job, reply["error"]))
+	return reply, payload
+
+## dumps a .blend (None is the startup file with the default cube), returns the scene file to load
+def blender_dump(blend, as_json=False):
+	if "--no-blender-pool" in sys.argv:
+		cmd = [BLENDER]
+		if blend:
+			cmd.append(blend)
+		cmd += ["--background", "--python", "./blender.py", "--", "--dump-json" if as_json else "--dump"]
+		print(cmd)
+		subprocess.check_call(cmd)
+		return "/tmp/dump.json" if as_json else "/tmp/dump.ngs"
+	name = hashlib.sha1(os.path.abspath(blend).encode() if blend else b"").hexdigest()[:12]
+	path = os.path.join(CACHE_DIR, "dumps", name + (".json" if as_json else ".ngs"))
+	os.makedirs(os.path.dirname(path), exist_ok=True)
+	reply, _ = blender_job("dump", blend, path=path, format="json" if as_json else "ngs")
+	return reply["path"]
+
+def stop_blender_pool():
+	for path in blender_sockets():
+		if quit_blender_worker(path):
+			print("stopped blender worker", path)
 
 
 ## @Test
@@ -1290,7 +3546,14 @@ if __name__ == "__main__":
 		if arg.startswith("--output="):
 			output = arg.split("=")[-1]
 
-	if output:
+	if "--compare" in sys.argv or any(a.startswith("--compare=") for a in sys.argv):
+		if compare_report(get_baseline()):
+			sys.exit(1)
+	elif "--save-baseline" in sys.argv or any(a.startswith("--save-baseline=") for a in sys.argv):
+		save_baseline(get_baseline())
+	elif "--blender-pool-stop" in sys.argv:
+		stop_blender_pool()
+	elif output:
 		if "--wasm" in sys.argv:
 			lib = build(wasm=True)
 			open(output, "wb").write(open(lib, "rb").read())
@@ -1302,5 +3565,7 @@ if __name__ == "__main__":
 			test_wasm()
 		elif "--main" in sys.argv:
 			test_exe()
+		elif "--watch" in sys.argv:
+			watch()
 		else:
 			test_python()